@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+"""
+@author: KANYAMIBWA Romaric
+BenchSaveSparse
+================
+Throughput benchmarks of the sparse input generation of save_sparse.py
+"""
+
+#############################################################################
+#  Copyright (C) 2019                                                       #
+#                                                                           #
+#                                                                           #
+#  Distributed under the terms of the GNU General Public License (GPL)      #
+#  either version 3, or (at your option) any later version                  #
+#                                                                           #
+#  http://www.gnu.org/licenses/                                             #
+#############################################################################
+
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import scipy.sparse as sparse
+
+import save_sparse
+
+SEED=2019
+
+
+def legacy_write(filename, n, row, col, data, rhs):
+    """Reference writer: one string per record, as save_sparse used to do."""
+    with open(filename,"w") as file:
+        file.write(str(n)+"\n")
+        file.write(str(len(data)))
+        for i in range(len(data)):
+            tmp="\n"+str(row[i]+1)+"\t"+str(col[i]+1)+"\t"+str(data[i])
+            file.write(tmp)
+        for j in range(len(rhs)):
+            tmp="\n"+str(rhs[j])
+            file.write(tmp)
+        file.write("\n")
+
+
+def bulk_write(filename, n, row, col, data, rhs):
+    """Chunked writer of save_sparse."""
+    with open(filename,"w") as file:
+        file.write(str(n)+"\n")
+        file.write(str(len(data)))
+        save_sparse.write_triplets(file,row,col,data)
+        save_sparse.write_rhs(file,rhs)
+        file.write("\n")
+
+
+def timed(func, *args):
+    """Return the wall time of func(*args)."""
+    start=time.time()
+    func(*args)
+    return time.time()-start
+
+
+def bench_writers(sizes, densities, tmpdir):
+    """Compare the legacy and the bulk writers, print one line per case."""
+    legacy_file=os.path.join(tmpdir,"legacy.txt")
+    bulk_file=os.path.join(tmpdir,"bulk.txt")
+    header="%10s %10s %12s %10s %12s %12s %8s %6s" % ("N","density","NNZ","MB",
+        "loop MB/s","bulk MB/s","speedup","same")
+    print(header)
+    print("-"*len(header))
+    for n in sizes:
+        for density in densities:
+            x=sparse.rand(n,n,density=density,format="coo")
+            data=np.random.uniform(save_sparse.LB,save_sparse.UB,x.nnz)
+            rhs=np.random.uniform(save_sparse.LB,save_sparse.UB,n)
+            args=(n,x.row,x.col,data,rhs)
+
+            t_loop=timed(legacy_write,legacy_file,*args)
+            t_bulk=timed(bulk_write,bulk_file,*args)
+            size=os.path.getsize(bulk_file)/1.e6
+            with open(legacy_file,"rb") as f1, open(bulk_file,"rb") as f2:
+                same=f1.read()==f2.read()
+
+            print("%10d %10g %12d %10.1f %12.1f %12.1f %8.2f %6s" % (n,density,
+                x.nnz,size,size/t_loop,size/t_bulk,t_loop/t_bulk,same))
+
+
+def quiet(func, *args):
+    """Call func(*args) with its standard output discarded."""
+    stdout=sys.stdout
+    sys.stdout=open(os.devnull,"w")
+    try:
+        return func(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout=stdout
+
+
+def bench_scaling(sizes, densities, workers, tmpdir):
+    """Time the streaming generation for each number of workers."""
+    print("CPUs:",os.cpu_count())
+    ref_file=os.path.join(tmpdir,"ref.txt")
+    par_file=os.path.join(tmpdir,"par.txt")
+    header="%10s %10s %8s %10s %10s %10s %8s %6s" % ("N","density","workers",
+        "MB","time (s)","MB/s","speedup","same")
+    print(header)
+    print("-"*len(header))
+    for n in sizes:
+        for density in densities:
+            # fixed block size so that every worker count writes the same file
+            block_rows=save_sparse.default_block_rows(n,density)//16+1
+            t_ref=timed(quiet,save_sparse.stream_sparse_matrix,ref_file,n,
+                density,True,SEED,block_rows,1)
+            size=os.path.getsize(ref_file)/1.e6
+            for nb in workers:
+                t_par=timed(quiet,save_sparse.stream_sparse_matrix,par_file,n,
+                    density,True,SEED,block_rows,nb)
+                with open(ref_file,"rb") as f1, open(par_file,"rb") as f2:
+                    same=f1.read()==f2.read()
+                print("%10d %10g %8d %10.1f %10.2f %10.1f %8.2f %6s" % (n,density,
+                    nb,size,t_par,size/t_par,t_ref/t_par,same))
+
+
+def bench_codecs(sizes, densities, codecs, threads, tmpdir):
+    """Compare the size and the write/read times of the compressed outputs."""
+    plain_file=os.path.join(tmpdir,"plain.txt")
+    header="%10s %10s %6s %8s %10s %8s %10s %10s %10s %6s" % ("N","density",
+        "codec","threads","MB","ratio","write (s)","read (s)","MB/s","same")
+    print(header)
+    print("-"*len(header))
+    for n in sizes:
+        for density in densities:
+            t_write=timed(quiet,save_sparse.stream_sparse_matrix,plain_file,n,
+                density,True,SEED)
+            size=os.path.getsize(plain_file)/1.e6
+            start=time.time()
+            M,y=quiet(save_sparse.load_sparse_matrix,plain_file,True)
+            t_read=time.time()-start
+            print("%10d %10g %6s %8s %10.1f %8.2f %10.2f %10.2f %10.1f %6s" % (
+                n,density,"none","-",size,1.,t_write,t_read,size/t_write,True))
+            for codec in codecs:
+                for nb in threads:
+                    compression=save_sparse.compression_params(codec,None,nb)
+                    filename=save_sparse.output_filename(os.path.join(tmpdir,
+                        "compressed.txt"),compression)
+                    t_write=timed(quiet,save_sparse.stream_sparse_matrix,
+                        filename,n,density,True,SEED,None,1,"text","none",False,
+                        compression)
+                    csize=os.path.getsize(filename)/1.e6
+                    start=time.time()
+                    Mc,yc=quiet(save_sparse.load_sparse_matrix,filename,True)
+                    t_read=time.time()-start
+                    same=(Mc!=M).nnz==0 and np.array_equal(yc,y)
+                    print("%10d %10g %6s %8d %10.1f %8.2f %10.2f %10.2f %10.1f %6s"
+                        % (n,density,codec,compression["threads"],csize,size/csize,t_write,t_read,
+                        size/t_write,same))
+                    os.remove(filename)
+
+
+parser = ArgumentParser()
+
+parser.add_argument("-N", dest="sizes", nargs="+", type=int,
+    default=[1000,10000,50000], metavar="n",
+    help="Sparse matrix sizes [default value 1000 10000 50000]")
+
+parser.add_argument("-d","--density", dest="densities", nargs="+", type=float,
+    default=[1e-3,1e-2], metavar="r",
+    help="Densities of the sparse matrices [default value 1e-3 1e-2]")
+
+parser.add_argument("--workers", dest="workers", nargs="+", type=int,
+    default=None, metavar="w",
+    help="Run the parallel scaling benchmark with these numbers of workers "
+    "instead of comparing the writers")
+
+parser.add_argument("--codecs", dest="codecs", nargs="+", default=None,
+    choices=sorted(save_sparse.CODECS), metavar="c",
+    help="Run the compression benchmark with these codecs (gzip xz zstd)")
+
+parser.add_argument("--threads", dest="threads", nargs="+", type=int,
+    default=[1,0], metavar="t",
+    help="Compression threads of the codec benchmark, 0 for all the cores "
+    "[default value 1 0]")
+
+parser.add_argument("--tmpdir", dest="tmpdir", default=None, metavar="DIR",
+    help="Directory of the generated files [default: system temporary directory]")
+
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    tmpdir=tempfile.mkdtemp(dir=args.tmpdir)
+    try:
+        if args.codecs:
+            bench_codecs(args.sizes,args.densities,args.codecs,args.threads,
+                tmpdir)
+        elif args.workers:
+            bench_scaling(args.sizes,args.densities,args.workers,tmpdir)
+        else:
+            bench_writers(args.sizes,args.densities,tmpdir)
+    finally:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir,name))
+        os.rmdir(tmpdir)
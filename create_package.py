@@ -112,7 +112,8 @@ def update_benchfiles(file,path):
 
 	# print(command_matrix)  
 
-	source_files=["save_sparse.py","dsimpletest.F","mmio.f"]
+	source_files=["save_sparse.py","bench_save_sparse.py","matrix_cache.py",
+		"run_benchmarks.py","dsimpletest.F","mmio.f","hbio.f"]
 	command_src ="cp "+" ".join(source_files)
 	command_src+=" "+uncompressed
 
@@ -0,0 +1,175 @@
+      subroutine hbinfo(iunit,title,key,mxtype,rows,cols,nnz,
+     *                  rhstyp,nrhs)
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+c
+c This routine will read the header of a Harwell-Boeing formatted file,
+c so that the arrays given to hbread can be allocated to its sizes.
+c
+c The unit iunit must be open, and the file will be rewound on return.
+c
+c Follows the sample reader HarwellBoeing.f (Duff, Grimes and Lewis,
+c User's Guide for the Harwell-Boeing Sparse Matrix Collection).
+c
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+c
+c   Arguments:
+c
+c   name     type      in/out description
+c   ---------------------------------------------------------------
+c
+c   iunit    integer     in   Unit identifier for the file
+c                             containing the data to be read.
+c                             Must be open prior to call.
+c                             Will be rewound on return.
+c
+c   title   character*72 out  Title of the matrix.
+c
+c   key     character*8  out  Key of the matrix.
+c
+c   mxtype  character*3  out  Type of the matrix:
+c                                (1) R real, C complex, P pattern
+c                                (2) S symmetric, U unsymmetric,
+c                                    H hermitian, Z skew-symmetric,
+c                                    R rectangular
+c                                (3) A assembled, E elemental
+c
+c   rows     integer     out  Number of rows in matrix.
+c
+c   cols     integer     out  Number of columns in matrix.
+c
+c   nnz      integer     out  Number of stored entries (one triangle
+c                             of symmetric matrices).
+c
+c   rhstyp  character*3  out  Type of the right-hand sides:
+c                                (1) F full, M same format as the
+c                                    matrix
+c                                (2) G starting guesses given
+c                                (3) X solutions given
+c
+c   nrhs     integer     out  Number of right-hand sides, 0 if none.
+c
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+      integer iunit,rows,cols,nnz,nrhs
+      character title*72,key*8,mxtype*3,rhstyp*3
+      integer valcrd,rhscrd,neltvl,nrhsix
+      character ptrfmt*16,indfmt*16,valfmt*20,rhsfmt*20
+
+      call hbhead(iunit,title,key,mxtype,rows,cols,nnz,neltvl,
+     *            valcrd,rhscrd,ptrfmt,indfmt,valfmt,rhsfmt,
+     *            rhstyp,nrhs,nrhsix)
+      rewind(iunit)
+      return
+      end
+c
+c End of subroutine hbinfo
+c
+c
+      subroutine hbread(iunit,rows,cols,nnz,colptr,rowind,values,
+     *                  rhs,gotrhs)
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+c
+c This routine will read the compressed columns of an assembled
+c Harwell-Boeing matrix, whose sizes are given by hbinfo, in double
+c precision. The first right-hand side is read if it is full.
+c
+c The unit iunit must be open, and the file will be rewound on return.
+c
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+c
+c   Arguments:
+c
+c   name     type      in/out description
+c   ---------------------------------------------------------------
+c
+c   iunit    integer     in   Unit identifier for the file
+c                             containing the data to be read.
+c                             Must be open prior to call.
+c                             Will be rewound on return.
+c
+c   rows     integer     in   Number of rows in matrix.
+c
+c   cols     integer     in   Number of columns in matrix.
+c
+c   nnz      integer     in   Number of stored entries.
+c
+c   colptr   integer(cols+1)  out  Start of each column in rowind
+c                             and values, colptr(cols+1)=nnz+1.
+c
+c   rowind   integer(nnz)     out  Row indices of the entries.
+c
+c   values   double precision(nnz)  out  Values of the entries, left
+c                             unchanged for pattern matrices.
+c
+c   rhs      double precision(rows)  out  First right-hand side.
+c
+c   gotrhs   logical     out  True if rhs was read.
+c
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+      integer iunit,rows,cols,nnz
+      integer colptr(cols+1),rowind(nnz)
+      double precision values(nnz),rhs(rows)
+      logical gotrhs
+      integer i,nrhs,nrhsix,neltvl,valcrd,rhscrd
+      character title*72,key*8,mxtype*3,rhstyp*3
+      character ptrfmt*16,indfmt*16,valfmt*20,rhsfmt*20
+
+      call hbhead(iunit,title,key,mxtype,rows,cols,nnz,neltvl,
+     *            valcrd,rhscrd,ptrfmt,indfmt,valfmt,rhsfmt,
+     *            rhstyp,nrhs,nrhsix)
+      if ( mxtype(3:3) .ne. 'A' ) then
+         print *,'ERROR: Only assembled Harwell-Boeing matrices ',
+     *           'are supported: ',mxtype
+         stop
+      endif
+
+      read(iunit,ptrfmt) (colptr(i),i=1,cols+1)
+      read(iunit,indfmt) (rowind(i),i=1,nnz)
+      if ( valcrd .gt. 0 ) then
+         read(iunit,valfmt) (values(i),i=1,nnz)
+      endif
+
+      gotrhs = rhscrd .gt. 0 .and. nrhs .gt. 0 .and.
+     *         rhstyp(1:1) .eq. 'F'
+      if ( gotrhs ) then
+         read(iunit,rhsfmt) (rhs(i),i=1,rows)
+      endif
+
+      rewind(iunit)
+      return
+      end
+c
+c End of subroutine hbread
+c
+c
+      subroutine hbhead(iunit,title,key,mxtype,rows,cols,nnz,neltvl,
+     *                  valcrd,rhscrd,ptrfmt,indfmt,valfmt,rhsfmt,
+     *                  rhstyp,nrhs,nrhsix)
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+c
+c Read the header block of a Harwell-Boeing file (4 or 5 lines) from
+c the current position of iunit.
+c
+ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+      integer iunit,rows,cols,nnz,neltvl,valcrd,rhscrd,nrhs,nrhsix
+      integer totcrd,ptrcrd,indcrd
+      character title*72,key*8,mxtype*3,rhstyp*3
+      character ptrfmt*16,indfmt*16,valfmt*20,rhsfmt*20
+
+      read(iunit,1000) title,key,
+     *                 totcrd,ptrcrd,indcrd,valcrd,rhscrd,
+     *                 mxtype,rows,cols,nnz,neltvl,
+     *                 ptrfmt,indfmt,valfmt,rhsfmt
+      rhstyp = '   '
+      nrhs = 0
+      nrhsix = 0
+      if ( rhscrd .gt. 0 ) then
+         read(iunit,1001) rhstyp,nrhs,nrhsix
+      endif
+      return
+
+ 1000 format ( A72, A8 / 5I14 / A3, 11X, 4I14 / 2A16, 2A20 )
+ 1001 format ( A3, 11X, 2I14 )
+      end
+c
+c End of subroutine hbhead
+c
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+"""
+@author: KANYAMIBWA Romaric
+MatrixCache
+================
+Content-addressed cache of the benchmark inputs generated by save_sparse.py
+
+Each entry is keyed on the SHA-256 of the generator parameters (including the
+seed, the generator version and the output format) and holds every file of one
+generation (matrix, RHS, manufactured solution) in DIR/objects/<key>/. A hit
+hardlinks the files to the requested name (or copies them across filesystems).
+The least recently used entries are evicted beyond the disk budget, and the
+files are checked against their size and SHA-256 before being returned.
+
+Hardlinked files share the cached data: they must not be rewritten in place.
+"""
+
+#############################################################################
+#  Copyright (C) 2019                                                       #
+#                                                                           #
+#                                                                           #
+#  Distributed under the terms of the GNU General Public License (GPL)      #
+#  either version 3, or (at your option) any later version                  #
+#                                                                           #
+#  http://www.gnu.org/licenses/                                             #
+#############################################################################
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+from contextlib import contextmanager
+
+INDEX="index.json"
+LOCK="lock"
+# Base name of the files generated in the cache
+BASE="matrix"
+# Bytes read at once by the checksums
+HASH_CHUNK=1<<20
+GB=1<<30
+
+
+def cache_key(params):
+    """SHA-256 of the generator parameters `params` (a dict of JSON values)."""
+    text=json.dumps(params,sort_keys=True,separators=(",",":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def file_checksum(filename):
+    """SHA-256 of the content of `filename`."""
+    digest=hashlib.sha256()
+    with open(filename,"rb") as file:
+        for block in iter(lambda: file.read(HASH_CHUNK),b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_info(filename):
+    """Size, modification time and checksum of `filename`."""
+    stat=os.stat(filename)
+    return {"size":stat.st_size,"mtime":stat.st_mtime,
+        "sha256":file_checksum(filename)}
+
+
+def make_dirs(path):
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+
+def entry_dir(cache_dir, key):
+    return os.path.join(cache_dir,"objects",key[:2],key)
+
+
+@contextmanager
+def locked_index(cache_dir):
+    """Lock the cache and yield its index, saved at the end of the block."""
+    make_dirs(cache_dir)
+    with open(os.path.join(cache_dir,LOCK),"a") as lock:
+        fcntl.flock(lock,fcntl.LOCK_EX)
+        path=os.path.join(cache_dir,INDEX)
+        index={}
+        if os.path.exists(path):
+            with open(path) as file:
+                index=json.load(file)
+        yield index
+        with open(path+".tmp","w") as file:
+            json.dump(index,file,indent=1,sort_keys=True)
+        os.rename(path+".tmp",path)
+
+
+def check_entry(cache_dir, key, entry, full=False):
+    """True if the files of `entry` are intact.
+
+    Files with their recorded size and modification time are trusted unless
+    `full`; the others are checked against their SHA-256.
+    """
+    for name,info in entry["files"].items():
+        path=os.path.join(entry_dir(cache_dir,key),name)
+        if not os.path.exists(path):
+            return False
+        stat=os.stat(path)
+        if stat.st_size!=info["size"]:
+            return False
+        if full or stat.st_mtime!=info["mtime"]:
+            if file_checksum(path)!=info["sha256"]:
+                return False
+            info["mtime"]=stat.st_mtime
+    return True
+
+
+def remove_entry(cache_dir, index, key):
+    shutil.rmtree(entry_dir(cache_dir,key),ignore_errors=True)
+    del index[key]
+
+
+def cache_size(index):
+    return sum(entry["size"] for entry in index.values())
+
+
+def evict(cache_dir, index, budget, keep=()):
+    """Remove the least recently used entries until the cache holds at most
+    `budget` bytes; return the evicted keys."""
+    total=cache_size(index)
+    evicted=[]
+    for key in sorted(index,key=lambda key: index[key]["last_used"]):
+        if total<=budget:
+            break
+        if key in keep:
+            continue
+        total-=index[key]["size"]
+        remove_entry(cache_dir,index,key)
+        evicted.append(key)
+    return evicted
+
+
+def link_files(cache_dir, key, entry, filename):
+    """Hardlink (or copy) the files of `entry` to the names of `filename`:
+    matrix.mtx -> filename, matrix_rhs1.mtx -> filename's RHS and so on.
+    Return the linked names."""
+    stem=filename[:len(filename)-len(entry["params"]["suffix"])]
+    names=[]
+    for name in sorted(entry["files"]):
+        dest=stem+name[len(BASE):]
+        if os.path.lexists(dest):
+            os.remove(dest)
+        src=os.path.join(entry_dir(cache_dir,key),name)
+        try:
+            os.link(src,dest)
+        except OSError:
+            shutil.copyfile(src,dest)
+        names.append(dest)
+    return names
+
+
+def fetch(cache_dir, params, generate, filename, budget=None, verify=False):
+    """Give `filename` (and its RHS/solution files) the content generated with
+    `params`, from the cache when possible.
+
+    generate: function writing the files for a given file name, called on a
+        miss
+    budget: size of the cache in bytes, None for no limit
+    verify: check the SHA-256 of the files on a hit
+    """
+    suffix=".mtx" if filename.endswith(".mtx") else ""
+    params=dict(params,suffix=suffix)
+    key=cache_key(params)
+    with locked_index(cache_dir) as index:
+        entry=index.get(key)
+        if entry is not None and not check_entry(cache_dir,key,entry,verify):
+            print("Cache entry",key,"is corrupted, regenerating it")
+            remove_entry(cache_dir,index,key)
+            entry=None
+        if entry is not None:
+            entry["last_used"]=time.time()
+            entry["hits"]+=1
+            print("Cache hit",key)
+            return link_files(cache_dir,key,entry,filename)
+
+    print("Cache miss",key)
+    tmpdir=tempfile.mkdtemp(dir=make_dirs(os.path.join(cache_dir,"tmp")))
+    try:
+        generate(os.path.join(tmpdir,BASE+suffix))
+        files=dict((name,file_info(os.path.join(tmpdir,name)))
+            for name in os.listdir(tmpdir))
+        with locked_index(cache_dir) as index:
+            now=time.time()
+            if key not in index:
+                path=entry_dir(cache_dir,key)
+                make_dirs(os.path.dirname(path))
+                os.rename(tmpdir,path)
+                index[key]={"params":params,"files":files,"created":now,
+                    "size":sum(info["size"] for info in files.values()),
+                    "hits":0}
+            index[key]["last_used"]=now
+            if budget is not None:
+                for old in evict(cache_dir,index,budget,keep=(key,)):
+                    print("Evicted",old)
+            return link_files(cache_dir,key,index[key],filename)
+    finally:
+        shutil.rmtree(tmpdir,ignore_errors=True)
+
+
+def list_cache(cache_dir):
+    with locked_index(cache_dir) as index:
+        for key in sorted(index,key=lambda key: index[key]["last_used"]):
+            entry=index[key]
+            params=dict((name,value) for name,value in entry["params"].items()
+                if value not in (None,False))
+            print("%s %10.3f GB %5d hits  %s" % (key[:16],entry["size"]/float(GB),
+                entry["hits"],json.dumps(params,sort_keys=True)))
+        print("Total: %d entries, %.3f GB" % (len(index),
+            cache_size(index)/float(GB)))
+
+
+def verify_cache(cache_dir):
+    """Check every entry against its checksums, removing the corrupted ones."""
+    with locked_index(cache_dir) as index:
+        for key in list(index):
+            if not check_entry(cache_dir,key,index[key],full=True):
+                print("Removing corrupted entry",key)
+                remove_entry(cache_dir,index,key)
+
+
+parser = ArgumentParser(description="Maintenance of the matrix cache filled by "
+    "save_sparse.py --cache")
+
+parser.add_argument("cache_dir", metavar="DIR", help="Cache directory")
+
+parser.add_argument("--verify", dest="verify",action="store_true",default=False,
+    help="Check the checksums of every entry and remove the corrupted ones")
+
+parser.add_argument("--size", dest="size", type=float, default=None,
+    metavar="GB", help="Evict the least recently used entries down to this size")
+
+parser.add_argument("--clear", dest="clear",action="store_true",default=False,
+    help="Remove every entry")
+
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    if args.verify:
+        verify_cache(args.cache_dir)
+    if args.size is not None or args.clear:
+        with locked_index(args.cache_dir) as index:
+            budget=0 if args.clear else int(args.size*GB)
+            for key in evict(args.cache_dir,index,budget):
+                print("Evicted",key)
+    list_cache(args.cache_dir)
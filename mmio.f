@@ -75,7 +75,8 @@ c   ival     integer(nnz) out Integer data (if applicable, see 'field')
 c         
 c   rval     double(nnz) out  Real data (if applicable, see 'field')
 c         
-c   cval     complex(nnz)out  Complex data (if applicable, see 'field')
+c   cval     double complex(nnz) out  Complex data (if applicable, see
+c                             'field'), read in double precision
 c         
 ccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc      
 c
@@ -83,7 +84,7 @@ c Declarations:
 c
       integer,DIMENSION(:),INTENT(INOUT)::ival
       double precision,DIMENSION(:),INTENT(INOUT)::rval
-      complex,DIMENSION(:),INTENT(INOUT)::cval
+      double complex,DIMENSION(:),INTENT(INOUT)::cval
       double precision rpart,ipart
       integer,DIMENSION(:),INTENT(INOUT)::indx
       integer,DIMENSION(:),INTENT(INOUT)::jndx
@@ -199,7 +200,7 @@ c
         elseif ( field .eq. 'complex' ) then
           do 40 i=1,nnz
             read (iunit,fmt=*,end=4000) indx(i),jndx(i),rpart,ipart
-            cval(i) = cmplx(rpart,ipart)
+            cval(i) = cmplx(rpart,ipart,kind(rpart))
  40       continue
         elseif ( field .eq. 'pattern' ) then
           do 50 i=1,nnz
@@ -251,7 +252,7 @@ c
         elseif ( field .eq. 'complex' ) then
           do 70 i=1,nnzreq
             read (iunit,fmt=*,end=4000) rpart,ipart
-            cval(i) = cmplx(rpart,ipart)
+            cval(i) = cmplx(rpart,ipart,kind(rpart))
  70      continue
         else
            print *,'''pattern'' data not consistant with type ''array'''
@@ -42,30 +42,33 @@ C         See Subclause 13.8.2 of the Fortran 2003 standard.
           END SUBROUTINE MPI_ERROR_HANDLING
         END INTERFACE
 
-        INTEGER    status(MPI_STATUS_SIZE),I    
-        INTEGER*8  offset    !    Note,    might 
-        INTEGER nints, fh, ierr, count,FILESIZE,INTSIZE,nprocs,rank
-        DOUBLE PRECISION,ALLOCATABLE::buf(:)
-        DOUBLE PRECISION yty
+C       Binary container written by save_sparse.py --binary (version 1):
+C       CHARACTER(8) magic 'MUMPSBIN' then INTEGER*8 header fields
+C         HDR(1) version   HDR(2) N        HDR(3) NNZ
+C         HDR(4) bytes per IRN/JCN integer HDR(5) NRHS
+C         HDR(6:9) offsets of the IRN, JCN, A and RHS sections
+C       Each rank reads its slice of IRN, JCN and A collectively.
+        INTEGER    status(MPI_STATUS_SIZE)
+        INTEGER(KIND=MPI_OFFSET_KIND) offset
+        INTEGER fh, ierr, count, nprocs, rank, nloc
+        INTEGER*8 HDR(15), first, nnzloc
+        CHARACTER(len=8) magic
+        INTEGER,ALLOCATABLE::irn(:),jcn(:)
+        DOUBLE PRECISION,ALLOCATABLE::A(:)
         CHARACTER(len=120) filename,RHS
 
         INTEGER t1, t2, clock_rate, clock_max,typefile
         REAL*8 elapsed_time
 
         INTEGER :: error , junk
-        INTEGER :: NNZ,N
+        INTEGER*8 :: NNZ,N
 
         junk=MPI_COMM_WORLD
 
-        yty=0.0
         typefile=1
-        filename="Matrices/aster_matrix_input"
+        filename="Matrices/aster_matrix_input.bin"
         RHS=""
         call readargs(typefile,filename,RHS)
-        INQUIRE(FILE=filename, SIZE=FILESIZE)
-
-C       Get the size of doubles
-        INTSIZE=sizeof(yty)
 
 C       starts MPI
         CALL MPI_INIT(ierr)
@@ -77,33 +80,55 @@ C       get current process id
 C       Install a new error handler
         CALL MPI_Comm_set_errhandler(junk,MPI_ERRORS_RETURN,error )
 
-
-        IF (rank .eq. 0) THEN
-          print*,"FILESIZE:",FILESIZE
-        END IF
-
 C       Open FILE with MPI
         CALL MPI_FILE_OPEN(MPI_COMM_WORLD,filename,
      &  MPI_MODE_RDONLY,MPI_INFO_NULL,fh,ierr)
         CALL MPI_ERROR_HANDLING(ierr)
 
-        CALL MPI_FILE_READ(fh,N,1,MPI_INTEGER,status,ierr)
-        CALL MPI_FILE_READ(fh,NNZ,1,MPI_INTEGER,status,ierr)
+C       Every rank reads the header
+        offset=0
+        CALL MPI_FILE_READ_AT_ALL(fh,offset,magic,8,MPI_CHARACTER
+     &  ,status,ierr)
+        CALL MPI_ERROR_HANDLING(ierr)
+        offset=8
+        CALL MPI_FILE_READ_AT_ALL(fh,offset,HDR,15,MPI_INTEGER8
+     &  ,status,ierr)
         CALL MPI_ERROR_HANDLING(ierr)
 
-        print*,'N=',N
-        print*,'NNZ=',NNZ
-
-        nints  = FILESIZE/(nprocs*INTSIZE) 
+        IF ((magic .NE. 'MUMPSBIN') .OR. (HDR(1) .NE. 1)
+     &     .OR. (HDR(4) .NE. 4)) THEN
+          IF (rank .eq. 0) THEN
+            print*,'ERROR:Not a version 1 binary file with 4 bytes'
+     &      //' integers: ',filename
+          END IF
+          CALL MPI_Abort(MPI_COMM_WORLD,1,ierr)
+        END IF
 
-        ALLOCATE(buf(nints))
+        N=HDR(2)
+        NNZ=HDR(3)
+        IF (rank .eq. 0) THEN
+          print*,'N=',N
+          print*,'NNZ=',NNZ
+        END IF
 
-        print*,"PostAllocate:3 first read values",(buf(I),I=1,3)
+C       Slice of the entries owned by this rank
+        first=(NNZ*rank)/nprocs
+        nnzloc=(NNZ*(rank+1))/nprocs-first
+        nloc=INT(nnzloc)
 
+        ALLOCATE(irn(max(nloc,1)),jcn(max(nloc,1)),A(max(nloc,1)))
 
-        offset = rank*nints*INTSIZE+2*INTSIZE 
         CALL system_clock ( t1, clock_rate, clock_max )
-        CALL MPI_FILE_READ_AT_ALL(fh,offset,buf,nints,MPI_DOUBLE
+        offset=HDR(6)+first*4
+        CALL MPI_FILE_READ_AT_ALL(fh,offset,irn,nloc,MPI_INTEGER
+     &  ,status,ierr)
+        CALL MPI_ERROR_HANDLING(ierr)
+        offset=HDR(7)+first*4
+        CALL MPI_FILE_READ_AT_ALL(fh,offset,jcn,nloc,MPI_INTEGER
+     &  ,status,ierr)
+        CALL MPI_ERROR_HANDLING(ierr)
+        offset=HDR(8)+first*8
+        CALL MPI_FILE_READ_AT_ALL(fh,offset,A,nloc,MPI_DOUBLE_PRECISION
      &  ,status,ierr)
         CALL system_clock ( t2, clock_rate, clock_max )
         CALL MPI_ERROR_HANDLING(ierr)
@@ -111,21 +136,23 @@ C       Open FILE with MPI
         elapsed_time=real (t2-t1)
      &   /real(clock_rate)
 
-        CALL MPI_GET_COUNT(status,MPI_DOUBLE,count,ierr)  
+        CALL MPI_GET_COUNT(status,MPI_DOUBLE_PRECISION,count,ierr)
         CALL MPI_ERROR_HANDLING(ierr)
 
-        print*,"process",rank,"Read time:",elapsed_time,"sec" 
-        print*,"process",rank,"read",count,"integers"    
+        print*,"process",rank,"Read time:",elapsed_time,"sec"
+        print*,"process",rank,"read",count,"entries from",first+1
+        IF (nloc .GT. 0) THEN
+          print*,"process",rank,"first entry:",irn(1),jcn(1),A(1)
+        END IF
 
-C         print*,"***process",rank,":3 first read values",buf
-        CALL MPI_FILE_CLOSE(fh,ierr)  
+        CALL MPI_FILE_CLOSE(fh,ierr)
         CALL MPI_ERROR_HANDLING(ierr)
 
 
         CALL MPI_FINALIZE(ierr)
-        DEALLOCATE(buf)
+        DEALLOCATE(irn,jcn,A)
+
 
-      
       end 
 
       SUBROUTINE MPI_ERROR_HANDLING(error)
@@ -217,11 +244,12 @@ C                 print*,"HELP"
           print  '(a)','usage: dsimpletest [OPTIONS]'
           print  '(a)',''
           print  '(a)','Without options, typefile=1,filename='//
-     &    'aster_matrix_input'
+     &    'Matrices/aster_matrix_input.bin'
           print  '(a)',''
           print  '(a)','cmdline options:'
           print  '(a)',''
-          print  '(a)','  -f          Filename'
+          print  '(a)','  -f          Binary filename '//
+     &    '(save_sparse.py --binary)'
           print  '(a)','  --RHS       RHS Filename (needed for type 3)'
           print  '(a)','  -t          Typefile [|1,4|]'
           print  '(a)','  -h, --help  print usage information and exit'
@@ -527,7 +527,8 @@ def setup_mumps_benchmark(dep, summary, **kargs):
          }),
          ('Install',   {
             'command' : 'cp -r Matrices/ dsimpletest.F *.f '
-            'save_sparse.py Makefile %(dest)s/'
+            'save_sparse.py bench_save_sparse.py matrix_cache.py run_benchmarks.py '
+            'Makefile %(dest)s/'
             %{'dest':cfg['HOME_MUMPS_BENCH']} ,
             # 'capturestderr' : False,
          }),
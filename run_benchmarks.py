@@ -0,0 +1,1075 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+"""
+@author: KANYAMIBWA Romaric
+RunBenchmarks
+================
+Sweeps of dsimpletest runs over matrices x MPI ranks x OpenMP threads x
+orderings x arithmetics (the [sdcz]simpletest drivers), or over the rank x
+thread splits of a core count (--split), scheduled so that the cores stay busy
+without being oversubscribed.
+Each run gives one record (parameters, wall time, phase times, Gflops,
+residual and backward errors, determinant, and the INFOG/RINFOG entries written
+by dsimpletest --json)
+appended to a JSON lines file, and optionally to a CSV table, with the
+placement reported by the OpenMP runtime and by the launcher, and the peak
+resident memory of the processes of the run sampled from /proc. The runs in
+which MUMPS used more memory than it estimated are flagged, and the fastest
+configuration of each matrix is reported at the end of the sweep.
+
+With --bind, the ranks and their threads are bound to cores through the
+launcher and OMP_PLACES/OMP_PROC_BIND. With --ooc, the matrices are also
+factored out-of-core in the given directories, and the I/O volume and time of
+each directory are compared with the in-core runs. With --blr, they are also
+factored in block low-rank at each tolerance, and the flop and factor size
+reductions, the factorization time and the residual are compared with the
+full-rank runs. With --residual and --refine, the error analysis and the
+iterative refinement of MUMPS check the accuracy of the solutions, and their
+cost in solve time is reported.
+
+python run_benchmarks.py --show FILE... prints the records of JSON lines or CSV
+files (from the sweeps or from dsimpletest --json/--csv) as a table.
+"""
+
+#############################################################################
+#  Copyright (C) 2019                                                       #
+#                                                                           #
+#                                                                           #
+#  Distributed under the terms of the GNU General Public License (GPL)      #
+#  either version 3, or (at your option) any later version                  #
+#                                                                           #
+#  http://www.gnu.org/licenses/                                             #
+#############################################################################
+
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import re
+import shlex
+import subprocess
+import time
+from argparse import ArgumentParser
+
+HERE=os.path.dirname(os.path.abspath(__file__))
+
+# ICNTL(7) of the orderings
+ORDERINGS={"amd":0,"user":1,"amf":2,"scotch":3,"pord":4,"metis":5,"qamd":6,
+    "auto":7}
+# ICNTL(29) of the orderings of the parallel analysis (ICNTL(28)=2)
+PAR_ORDERINGS={"ptscotch":1,"parmetis":2}
+# Orderings of --compare-orderings (and of --ordering all): the unavailable
+# ones fail, or fall back to another ordering (ordering_used)
+COMPARED_ORDERINGS=["amd","amf","qamd","pord","scotch","metis","ptscotch",
+    "parmetis"]
+
+PHASES=("analysis","factorization","solve")
+
+# Arithmetics of the [sdcz]simpletest drivers; auto is d, or z for the complex
+# Matrix Market files
+ARITHS=("auto","s","d","c","z")
+
+# Magic of the binary containers of save_sparse.py --binary (type 5)
+BINARY_MAGIC=b"MUMPSBIN"
+# Suffixes of the Harwell-Boeing files (type 4)
+HB_SUFFIXES=(".rua",".rsa",".rza",".hb",".rb")
+
+# Values scraped from the output of dsimpletest and of MUMPS (ICNTL(4)>=2).
+# The Gflop amounts are the RINFOG(1:3) printed by dsimpletest; the
+# *_time are the times of the MUMPS drivers. The record of dsimpletest --json
+# takes precedence: these are a fallback for the runs which wrote no record
+# and for the values missing from it.
+PATTERNS=[
+    ("time",r"Resolution time:\s*(\S+)sec"),
+    ("analysis_gflop",r"^\s*Analysis:\s*(\S+)\s*Gflops"),
+    ("factorization_gflop",r"^\s*Factorization:\s*(\S+)\s*Gflops"),
+    ("solve_gflop",r"^\s*Resolution:\s*(\S+)\s*Gflops"),
+    ("determinant",r"^\s*Determinant:\s*(\S+)"),
+    ("ordering_used",r"Ordering option effectively used\s*=\s*(\d+)"),
+    ("analysis_time",r"ELAPSED TIME IN ANALYSIS DRIVER=\s*(\S+)"),
+    ("factorization_time",r"ELAPSED TIME IN FACTORIZATION DRIVER=\s*(\S+)"),
+    ("solve_time",r"ELAPSED TIME IN SOLVE DRIVER=\s*(\S+)"),
+    ("input_time",r"Input time:\s*(\S+)s"),
+    ("input_rate",r"Input time:.*MB/s=\s*(\S+)"),
+    ("sym",r"Arithmetic=\w\s+SYM=\s*(\d)"),
+    ("infog1",r"ERROR RETURN:\s*mumps_par%INFOG\(1\)=\s*(-?\d+)"),
+]
+
+# Placement of the run reported by the OpenMP runtime (OMP_DISPLAY_ENV) and by
+# Open MPI (--report-bindings), kept as strings
+TOPOLOGY_PATTERNS=[
+    ("omp_proc_bind",r"^\s*OMP_PROC_BIND\s*=\s*'([^']*)'"),
+    ("omp_places",r"^\s*OMP_PLACES\s*=\s*'([^']*)'"),
+]
+BINDING_PATTERN=r"MCW rank (\d+) bound to (.*)$"
+
+# Binding of --bind: options of the launcher (Open MPI syntax, with the
+# fields of --launcher), and OpenMP places and policy of the threads
+MPI_BIND="--map-by slot:PE={threads} --bind-to core --report-bindings"
+OMP_PLACES="cores"
+OMP_PROC_BIND="close"
+
+# Lines of dsimpletest --phases: wall and CPU times, GFlop of each phase
+PHASE_PATTERN=(r"^\s*Phase:\s*(\w+)\s+wall=\s*(\S+)s\s+cpu=\s*(\S+)s\s+"
+    r"GFlop=\s*(\S+)")
+
+FIELDS=["matrix","typefile","arith","ranks","threads","ordering","repeat",
+    "status",
+    "wall"]+[name for name,pattern in PATTERNS]+[phase+suffix
+    for phase in PHASES for suffix in ("_wall","_cpu","_flops","_gflops")]+[
+    "log"]
+
+
+def fortran_float(text):
+    """float() of a Fortran real, which may drop the E of 3-digit exponents."""
+    text=re.sub(r"(\d)([+-]\d{3})$",r"\1E\2",text.strip())
+    return float(text)
+
+
+def scraped_value(text):
+    """int or float of a value printed by Fortran, None if it does not parse
+    (asterisks when it overflows its edit descriptor)."""
+    try:
+        return int(text) if re.match(r"-?\d+$",text) else fortran_float(text)
+    except ValueError:
+        return None
+
+
+def parse_output(text):
+    """Values of PATTERNS found in the output `text` of a run, with the
+    per-phase times and flops of dsimpletest --phases."""
+    record={}
+    for name,pattern in TOPOLOGY_PATTERNS:
+        match=re.search(pattern,text,re.MULTILINE)
+        if match:
+            record[name]=match.group(1)
+    bindings=["%s: %s" % match.groups()
+        for match in re.finditer(BINDING_PATTERN,text,re.MULTILINE)]
+    if bindings:
+        record["rank_bindings"]="; ".join(sorted(bindings,
+            key=lambda text: int(text.split(":")[0])))
+    for name,pattern in PATTERNS:
+        match=re.search(pattern,text,re.MULTILINE)
+        if match:
+            record[name]=scraped_value(match.group(1))
+    for match in re.finditer(PHASE_PATTERN,text,re.MULTILINE):
+        phase=match.group(1)
+        record[phase+"_wall"]=scraped_value(match.group(2))
+        record[phase+"_cpu"]=scraped_value(match.group(3))
+        gflop=scraped_value(match.group(4))
+        record[phase+"_flops"]=gflop*1e9 if gflop is not None else None
+    return derive_record(record)
+
+
+def default_type(filename):
+    """Type of the input `filename`: 3 for Matrix Market files (.mtx), 4 for
+    Harwell-Boeing files (HB_SUFFIXES), 5 for the binary containers of
+    save_sparse.py --binary, 1 for the others."""
+    if filename.endswith(".mtx"):
+        return 3
+    if filename.lower().endswith(HB_SUFFIXES):
+        return 4
+    if os.path.exists(filename):
+        with open(filename,"rb") as file:
+            if file.read(len(BINARY_MAGIC))==BINARY_MAGIC:
+                return 5
+    return 1
+
+
+def matrix_field(filename):
+    """Field of the Matrix Market file `filename` (real, complex, integer or
+    pattern), None for the other files."""
+    if not filename.endswith(".mtx") or not os.path.exists(filename):
+        return None
+    with open(filename) as file:
+        header=file.readline().lower().split()
+    return header[3] if len(header)>3 else None
+
+
+def driver_binary(binary, arith):
+    """The [sdcz]simpletest driver of `arith` next to the dsimpletest
+    `binary`."""
+    path,name=os.path.split(binary)
+    if re.match(r"[sdcz]simpletest",name):
+        name=arith+name[1:]
+    return os.path.join(path,name)
+
+
+def parse_matrix(spec):
+    """Parse a FILE[:TYPE[:RHS]] matrix specification.
+
+    The type defaults to default_type(FILE), with the RHS FILE_rhs1.mtx for
+    Matrix Market files.
+    """
+    parts=spec.split(":")
+    filename=os.path.abspath(parts[0])
+    typefile=int(parts[1]) if len(parts)>1 and parts[1] else \
+        default_type(filename)
+    rhs=parts[2] if len(parts)>2 else None
+    if rhs is None and typefile==3:
+        rhs=filename[:-4]+"_rhs1.mtx"
+    return {"matrix":filename,"typefile":typefile,
+        "rhs":os.path.abspath(rhs) if rhs else None,
+        "field":matrix_field(filename)}
+
+
+def splits(cores):
+    """(ranks, threads) layouts using exactly `cores` cores."""
+    return [(ranks,cores//ranks) for ranks in range(1,cores+1)
+        if cores%ranks==0]
+
+
+def filesystem(path):
+    """Type and mount point of the file system of `path`, from /proc/mounts;
+    None if unknown."""
+    if not os.path.exists("/proc/mounts"):
+        return None
+    path=os.path.realpath(path)
+    best=None
+    with open("/proc/mounts") as file:
+        for line in file:
+            fields=line.split()
+            if len(fields)<3:
+                continue
+            mount=fields[1]
+            if (path==mount or path.startswith(mount.rstrip("/")+"/")) and \
+                (best is None or len(mount)>=len(best[1])):
+                best=(fields[2],mount)
+    return "%s on %s" % best if best else None
+
+
+def sweep(matrices, ranks, threads, orderings, repeat=1, ariths=("auto",),
+    layouts=None, ooc_dirs=(None,), blr_tols=(None,)):
+    """Runs of the cartesian product of the parameters.
+
+    layouts: (ranks, threads) pairs swept instead of ranks x threads
+    ooc_dirs: directories of the factors of the out-of-core runs, None for
+        in-core
+    blr_tols: tolerances of the block low-rank runs, None for full-rank
+    """
+    if layouts is None:
+        layouts=list(itertools.product(ranks,threads))
+    runs=[]
+    for matrix,arith,(nb_ranks,nb_threads),ordering,ooc_dir,blr_tol,index in \
+        itertools.product(matrices,ariths,layouts,orderings,ooc_dirs,
+        blr_tols,range(repeat)):
+        if arith=="auto":
+            arith="z" if matrix["field"]=="complex" else "d"
+        run=dict(matrix,arith=arith,ranks=nb_ranks,threads=nb_threads,
+            ordering=ordering,ooc_dir=ooc_dir,blr_tol=blr_tol,repeat=index)
+        if ooc_dir:
+            run["ooc_fs"]=filesystem(ooc_dir)
+        run["cores"]=nb_ranks*nb_threads
+        runs.append(run)
+    return runs
+
+
+def run_command(run, binary, launcher, cpus, pin=False, record=None,
+    options=(), bind=None):
+    """Command line of `run` on the cores `cpus`.
+
+    launcher: MPI launcher template, with the {ranks}, {threads} and {cpus}
+        fields; empty to run the binary directly (sequential builds)
+    pin: restrict the run to `cpus` with taskset
+    record: JSON record file of dsimpletest
+    options: other options of dsimpletest
+    bind: binding of the run, whose "mpi" options (same fields as
+        `launcher`) are added to the launcher
+    """
+    fields={"ranks":run["ranks"],"threads":run["threads"],
+        "cpus":",".join(str(cpu) for cpu in cpus)}
+    if launcher and bind:
+        launcher+=" "+bind["mpi"]
+    command=[arg.format(**fields) for arg in shlex.split(launcher)]
+    if not command and run["ranks"]!=1:
+        raise ValueError("%d ranks need an MPI launcher" % run["ranks"])
+    if pin:
+        command=["taskset","-c",fields["cpus"]]+command
+    command+=[driver_binary(binary,run["arith"]),"-f",run["matrix"],
+        "-t",str(run["typefile"])]
+    if run["ordering"] in PAR_ORDERINGS:
+        command+=["-o",str(ORDERINGS["auto"]),"--par-ordering",
+            str(PAR_ORDERINGS[run["ordering"]])]
+    else:
+        command+=["-o",str(ORDERINGS[run["ordering"]])]
+    if run["rhs"]:
+        command+=["--RHS",run["rhs"]]
+    if run.get("ooc_dir"):
+        command+=["--ooc",run["ooc_dir"]]
+    if run.get("blr_tol") is not None:
+        command+=["--blr",repr(run["blr_tol"])]
+    if record:
+        command+=["--json",record]
+    return command+list(options)
+
+
+def run_env(run, bind=None):
+    """Environment of `run`: OpenMP and BLAS threads, and the "places" and
+    "proc_bind" of the OpenMP threads given by `bind`.
+
+    The OpenMP runtime prints its settings (OMP_DISPLAY_ENV) in the log.
+    """
+    env=dict(os.environ)
+    for name in ("OMP_NUM_THREADS","MKL_NUM_THREADS","OPENBLAS_NUM_THREADS"):
+        env[name]=str(run["threads"])
+    env["OMP_DISPLAY_ENV"]="TRUE"
+    if bind:
+        env["OMP_PLACES"]=bind["places"]
+        env["OMP_PROC_BIND"]=bind["proc_bind"]
+    return env
+
+
+def schedule(runs, cores, start, jobs=0):
+    """Run `runs` concurrently on `cores` cores, largest first, as long as
+    their cores (ranks x threads) fit; yield (run, result) as they finish.
+
+    start(run, cpus) launches a run and returns a Popen-like object whose
+    finish() gives its result.
+    jobs: maximum number of concurrent runs, 0 for no limit
+    """
+    pending=sorted(runs,key=lambda run: -run["cores"])
+    free=list(range(cores))
+    running=[]
+    while pending or running:
+        for run in list(pending):
+            if jobs and len(running)>=jobs:
+                break
+            if run["cores"]<=len(free):
+                cpus=free[:run["cores"]]
+                del free[:run["cores"]]
+                running.append((start(run,cpus),run,cpus))
+                pending.remove(run)
+        if not running:
+            # a run larger than the machine
+            run=pending.pop(0)
+            yield run,{"status":"skipped"}
+            continue
+        time.sleep(0.05)
+        for item in list(running):
+            proc,run,cpus=item
+            if proc.poll() is not None:
+                running.remove(item)
+                free=sorted(free+cpus)
+                yield run,proc.finish()
+
+
+def process_tree(pid):
+    """Process `pid` and its descendants, from /proc."""
+    children={}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                with open("/proc/%s/stat" % name) as file:
+                    stat=file.read()
+            except (IOError,OSError):
+                continue
+            # the command name, in parentheses, may contain spaces
+            ppid=int(stat[stat.rindex(")")+2:].split()[1])
+            children.setdefault(ppid,[]).append(int(name))
+    tree=[pid]
+    for parent in tree:
+        tree+=children.get(parent,[])
+    return tree
+
+
+def peak_rss(pid):
+    """Name and peak resident memory (VmHWM, bytes) of the process `pid`, None
+    if it is gone."""
+    try:
+        with open("/proc/%d/status" % pid) as file:
+            status=dict(line.split(":",1) for line in file if ":" in line)
+    except (IOError,OSError):
+        return None
+    if "VmHWM" not in status:
+        return None
+    return status["Name"].strip(),int(status["VmHWM"].split()[0])*1024
+
+
+class Run(object):
+    """A dsimpletest process writing its output to a log file, and its record
+    to `record` if given to dsimpletest.
+
+    The peak resident memory of the processes named `program` (the ranks,
+    without the launcher) is sampled from /proc by poll(), so that the
+    growth after the last sample of a process is missed.
+    """
+
+    def __init__(self, command, env, log, record=None, program=None):
+        self.log=log
+        self.record=record
+        self.program=program
+        self.peaks={}
+        self.start=time.time()
+        with open(log,"w") as file:
+            file.write(" ".join(command)+"\n")
+            file.flush()
+            self.proc=subprocess.Popen(command,env=env,stdout=file,
+                stderr=subprocess.STDOUT)
+
+    def sample(self):
+        """Update the peak resident memory of the processes of the run."""
+        if not os.path.isdir("/proc"):
+            return
+        for pid in process_tree(self.proc.pid):
+            sample=peak_rss(pid)
+            # /proc truncates the names to 15 characters
+            if sample and (self.program is None or
+                sample[0]==self.program[:15]):
+                self.peaks[pid]=max(self.peaks.get(pid,0),sample[1])
+
+    def poll(self):
+        self.sample()
+        status=self.proc.poll()
+        if status is not None and not hasattr(self,"wall"):
+            self.wall=time.time()-self.start
+        return status
+
+    def finish(self):
+        with open(self.log) as file:
+            record=parse_output(file.read())
+        if self.peaks:
+            record.update(peak_rss_mb=max(self.peaks.values())/1e6,
+                peak_rss_total_mb=sum(self.peaks.values())/1e6,
+                rss_processes=len(self.peaks))
+        if self.record and os.path.exists(self.record):
+            record.update(read_records(self.record)[-1])
+            record["record"]=self.record
+        derive_record(record)
+        failed=self.proc.returncode or (record.get("infog1") or 0)<0 \
+            or record.get("time") is None
+        record.update(status="failed" if failed else "ok",wall=self.wall,
+            log=self.log)
+        return record
+
+
+def run_sweep(runs, binary, launcher, cores, outdir, jobs=0, pin=False,
+    results="results.jsonl", table=None, options=(), bind=None):
+    """Run the sweep, writing the logs in `outdir` and one record per run in
+    `results` (JSON lines, appended) and `table` (CSV).
+
+    options: other options of dsimpletest, common to the runs
+    bind: binding of the runs (see run_command and run_env), None to leave
+        the placement to the launcher and to the OpenMP runtime
+    """
+    logdir=os.path.join(outdir,"logs")
+    if not os.path.isdir(logdir):
+        os.makedirs(logdir)
+    stamp=time.strftime("%Y%m%d-%H%M%S")
+
+    def start(run, cpus):
+        name="%s-%s-%s-r%d-t%d-%s%s%s-%d.log" % (stamp,
+            os.path.basename(run["matrix"]),run["arith"],run["ranks"],
+            run["threads"],run["ordering"],
+            "-ooc"+re.sub(r"\W+","_",run["ooc_dir"]) if run.get("ooc_dir")
+            else "","-blr%g" % run["blr_tol"]
+            if run.get("blr_tol") is not None else "",run["repeat"])
+        log=os.path.join(logdir,name)
+        record=log[:-4]+".json"
+        run["cpus"]=",".join(str(cpu) for cpu in cpus)
+        return Run(run_command(run,binary,launcher,cpus,pin,record,options,
+            bind),run_env(run,bind),log,record,
+            os.path.basename(driver_binary(binary,run["arith"])))
+
+    records=[]
+    with open(os.path.join(outdir,results),"a") as out:
+        for run,result in schedule(runs,cores,start,jobs):
+            record=dict(result)
+            record.update((name,run[name]) for name in ("matrix","typefile",
+                "arith","ranks","threads","ordering","repeat"))
+            if run.get("ooc_dir"):
+                record.update(ooc_dir=run["ooc_dir"],ooc_fs=run["ooc_fs"])
+            if run.get("blr_tol") is not None:
+                record["blr_tol"]=run["blr_tol"]
+            record.update(cpus=run.get("cpus"),pinned=pin,bound=bool(bind))
+            out.write(json.dumps(record,sort_keys=True)+"\n")
+            out.flush()
+            records.append(record)
+            print("%-30s %s ranks=%-4d threads=%-3d %-6s %-8s wall=%s%s" % (
+                os.path.basename(run["matrix"]),run["arith"],run["ranks"],
+                run["threads"],run["ordering"],record["status"],
+                "%.3fs" % record["wall"] if "wall" in record else "-",
+                " memory: "+record["mem_flags"] if record.get("mem_flags")
+                else ""))
+    if table:
+        write_table(os.path.join(outdir,table),records)
+    return records
+
+
+def write_table(filename, records):
+    """Write the records as a CSV table."""
+    fields=FIELDS+sorted(set(itertools.chain.from_iterable(records))-set(FIELDS))
+    with open(filename,"w") as file:
+        writer=csv.DictWriter(file,fields)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+
+
+def parse_value(text):
+    """Value of a CSV field: None, int, float or string."""
+    if text in ("","null"):
+        return None
+    for kind in (int,float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def rank_values(value):
+    """Values of a per-rank field: a list in JSON, a string of integers in
+    CSV (an integer for one rank)."""
+    if isinstance(value,(int,float)):
+        return [value]
+    if isinstance(value,str):
+        return [int(item) for item in re.findall(r"-?\d+",value)]
+    return value
+
+
+def memory_flags(record):
+    """Memory of the run above the estimate of the analysis: "used>est" when
+    MUMPS used more than its estimate on a rank (INFO(22) > INFO(15), or
+    INFOG(21) > INFOG(16)), "alloc>est" when it allocated more than its
+    relaxed estimate (ICNTL(14)) on a rank (INFO(16)). The estimate of the
+    out-of-core runs is the out-of-core one (INFO(17), INFOG(26))."""
+    flags=[]
+    ooc="_ooc" if record.get("ooc") else ""
+    used=rank_values(record.get("mem_used_rank_mb"))
+    estimated=rank_values(record.get("mem_est%s_rank_mb" % ooc))
+    if used and estimated:
+        over=any(value>estimate for value,estimate in zip(used,estimated))
+    else:
+        over=(record.get("mem_used_max_mb") or 0)> \
+            (record.get("mem_est%s_max_mb" % ooc) or float("inf"))
+    if over:
+        flags.append("used>est")
+    allocated=rank_values(record.get("mem_alloc_rank_mb"))
+    relax=record.get("mem_relax_pct")
+    # the estimates are rounded to MB
+    if allocated and estimated and relax is not None and any(
+        value>estimate*(1+relax/100.0)+1
+        for value,estimate in zip(allocated,estimated)):
+        flags.append("alloc>est")
+    return ",".join(flags)
+
+
+def derive_record(record):
+    """Add the determinant, the GFlop/s rates and the memory flags to a record
+    of dsimpletest.
+
+    The rate of a phase is computed from its own time (--phases), or else from
+    the time of its MUMPS driver.
+    """
+    mantissa=record.get("determinant_mantissa")
+    if mantissa is not None:
+        try:
+            record["determinant"]=math.ldexp(mantissa,
+                record["determinant_exponent"])
+        except OverflowError:
+            record["determinant"]=math.copysign(float("inf"),mantissa)
+    if record.get("flops_elim") is not None:
+        if record.get("time"):
+            record["gflops"]=record["flops_elim"]/record["time"]/1e9
+        if record.get("factorization_flops") is None:
+            record["factorization_flops"]=record["flops_elim"]+(
+                record.get("flops_assembly") or 0)
+    for phase in PHASES:
+        flops=record.get(phase+"_flops")
+        elapsed=record.get(phase+"_wall") or record.get(phase+"_time")
+        if flops is not None and elapsed:
+            record[phase+"_gflops"]=flops/elapsed/1e9
+    flags=memory_flags(record)
+    if flags:
+        record["mem_flags"]=flags
+    else:
+        record.pop("mem_flags",None)
+    # resident memory beyond the MUMPS data: input, libraries, buffers
+    if record.get("peak_rss_mb") is not None and \
+        record.get("mem_est_max_mb") is not None:
+        record["rss_overhead_mb"]=record["peak_rss_mb"]- \
+            record.get("mem_used_max_mb",record["mem_est_max_mb"])
+    return record
+
+
+def read_records(filename):
+    """Records of a JSON lines or CSV (.csv) file written by a sweep or by
+    dsimpletest --json/--csv."""
+    with open(filename) as file:
+        if filename.endswith(".csv"):
+            records=[dict((key,parse_value(value)) for key,value in row.items())
+                for row in csv.DictReader(file)]
+        else:
+            records=[json.loads(line) for line in file if line.strip()]
+    return [derive_record(record) for record in records]
+
+
+# Columns of --show
+SHOW_FIELDS=["file","matrix","arith","sym","nprocs","ranks","nthreads",
+    "threads","ordering","ordering_used","status","input_time","input_rate",
+    "time","gflops","mem_est_max_mb","mem_used_max_mb","mem_used_total_mb",
+    "peak_rss_mb","mem_flags","delayed_pivots","determinant"]
+
+
+# Columns of --show --phases
+PHASE_FIELDS=["file","matrix","nprocs","ranks","nthreads","threads","ordering",
+    "status"]+[phase+suffix for phase in PHASES
+    for suffix in ("_wall","_cpu","_gflops")]
+
+
+# Columns of --show --solves
+SOLVE_FIELDS=["file","matrix","nprocs","ranks","nthreads","threads","status",
+    "factorization_wall","nsolves"]+["solve_single_"+name for name in ("min",
+    "p50","p90","p99","max","rate")]+["solve_blocked_time","solve_blocked_rate"]
+
+
+# Columns of the accuracy of the solutions (--residual, --refine)
+ACCURACY_FIELDS=["matrix","arith","ranks","threads","ordering","blr_tol",
+    "error_analysis","residual_scaled","backward_error1","backward_error2",
+    "condition1","condition2","forward_error","refine","refine_steps",
+    "solve_wall","solve_plain_wall","accuracy_cost","status"]
+
+
+# Columns of the runs above the memory estimate
+MEMORY_FIELDS=["matrix","arith","ranks","threads","ordering","mem_relax_pct",
+    "ooc","mem_est_rank_mb","mem_est_ooc_rank_mb","mem_alloc_rank_mb",
+    "mem_used_rank_mb","peak_rss_mb","peak_rss_total_mb","rss_overhead_mb",
+    "mem_flags","log"]
+
+
+# Columns of --ooc
+OOC_FIELDS=["matrix","arith","ranks","threads","ordering","ooc_dir","ooc_fs",
+    "factorization_wall","solve_wall","io_written_mb","io_read_mb",
+    "io_storage_written_mb","io_storage_read_mb","io_time","io_rate_mbs",
+    "slowdown","status"]
+
+
+def compare_ooc(records):
+    """Records of the in-core and out-of-core runs of each matrix, with the
+    I/O volume in MB, the I/O time (extra factorization and solve time
+    compared with the fastest in-core run), the I/O rate and the slowdown of
+    the out-of-core runs."""
+    def phases_time(record):
+        return (record.get("factorization_wall") or 0)+ \
+            (record.get("solve_wall") or 0)
+
+    groups={}
+    for record in records:
+        key=(record.get("matrix") or record.get("file"),record.get("arith"),
+            record.get("ranks") or record.get("nprocs"),
+            record.get("threads") or record.get("nthreads"),
+            record.get("ordering"))
+        groups.setdefault(key,[]).append(record)
+    compared=[]
+    for key in sorted(groups,key=str):
+        incore=[phases_time(record) for record in groups[key]
+            if not record.get("ooc") and record.get("status","ok")=="ok"
+            and phases_time(record)]
+        for record in sorted(groups[key],key=lambda record:
+            (bool(record.get("ooc")),str(record.get("ooc_dir")))):
+            record=dict(record)
+            for name in ("io_written","io_read","io_storage_written",
+                "io_storage_read"):
+                if record.get(name) is not None:
+                    record[name+"_mb"]=record[name]/1e6
+            if not record.get("ooc"):
+                record["ooc_dir"]="in-core"
+            elif incore and record.get("status","ok")=="ok":
+                io_time=phases_time(record)-min(incore)
+                record.update(io_time=io_time,
+                    slowdown=phases_time(record)/min(incore))
+                volume=(record.get("io_written") or 0)+ \
+                    (record.get("io_read") or 0)
+                if io_time>0:
+                    record["io_rate_mbs"]=volume/1e6/io_time
+            compared.append(record)
+    return compared
+
+
+# Columns of --blr
+BLR_FIELDS=["matrix","arith","ranks","threads","ordering","blr_tol",
+    "factorization_wall","speedup","flops_elim","flops_blr","flops_ratio",
+    "factor_ratio","residual_scaled","backward_error1","status"]
+
+
+def compare_blr(records):
+    """Records of the full-rank and block low-rank runs of each matrix, with
+    the ratio of the BLR to the full-rank flops of the factorization
+    (RINFOG(14)/RINFOG(3)), and the ratio of the factor entries (INFOG(29))
+    and the factorization speedup compared with the fastest full-rank run.
+
+    MUMPS 5.1 stores the BLR factors in full-rank form, and INFOG(29) counts
+    them as such: the ratio is "unavailable" when the BLR run has as many
+    factor entries as the full-rank one.
+    """
+    groups={}
+    for record in records:
+        key=(record.get("matrix") or record.get("file"),record.get("arith"),
+            record.get("ranks") or record.get("nprocs"),
+            record.get("threads") or record.get("nthreads"),
+            record.get("ordering"),record.get("ooc_dir"))
+        groups.setdefault(key,[]).append(record)
+    compared=[]
+    for key in sorted(groups,key=str):
+        full=[record for record in groups[key] if record.get("blr_tol") is None
+            and record.get("status","ok")=="ok"
+            and record.get("factorization_wall")]
+        base=min(full,key=lambda record: record["factorization_wall"]) \
+            if full else None
+        for record in sorted(groups[key],key=lambda record:
+            (record.get("blr_tol") is not None,-(record.get("blr_tol") or 0))):
+            record=dict(record)
+            if record.get("blr_tol") is None:
+                record["blr_tol"]="full-rank"
+            elif record.get("flops_blr") is not None and \
+                record.get("flops_elim"):
+                record["flops_ratio"]=record["flops_blr"]/record["flops_elim"]
+            if base and record.get("status","ok")=="ok":
+                if record.get("factorization_wall"):
+                    record["speedup"]=base["factorization_wall"]/ \
+                        record["factorization_wall"]
+                if record.get("blr_tol")!="full-rank" and \
+                    record.get("factor_entries") is not None and \
+                    base.get("factor_entries"):
+                    record["factor_ratio"]=record["factor_entries"]/ \
+                        float(base["factor_entries"]) \
+                        if record["factor_entries"]!=base["factor_entries"] \
+                        else "unavailable"
+            compared.append(record)
+    return compared
+
+
+# Columns of the best configurations
+BEST_FIELDS=["matrix","arith","ordering","ooc_dir","blr_tol","runs","ranks",
+    "threads",
+    "cpus","omp_proc_bind","omp_places","time","gflops","rank_bindings"]
+
+
+def best_runs(records):
+    """Fastest successful record (Resolution time) of each matrix, arithmetic,
+    ordering, out-of-core directory and BLR tolerance, with the number of such
+    records in "runs"."""
+    groups={}
+    for record in records:
+        if record.get("status","ok")!="ok" or record.get("time") is None:
+            continue
+        key=(record.get("matrix") or record.get("file"),record.get("arith"),
+            record.get("ordering"),record.get("ooc_dir"),record.get("blr_tol"))
+        groups.setdefault(key,[]).append(record)
+    best=[]
+    for key in sorted(groups,key=str):
+        record=dict(min(groups[key],key=lambda record: record["time"]),
+            runs=len(groups[key]))
+        best.append(record)
+    return best
+
+
+def print_best(records):
+    """Print the best configurations of the records, if some were compared."""
+    best=best_runs(records)
+    if any(record["runs"]>1 for record in best):
+        print()
+        print("Best configurations:")
+        print_table(best,BEST_FIELDS)
+
+
+# Columns of --compare-orderings
+ORDERING_FIELDS=["matrix","arith","ranks","threads","rank","ordering",
+    "ordering_used","analysis_used","analysis_wall","factor_space_est",
+    "flops_elim_est","factorization_wall","time","status","infog1"]
+
+
+def rank_orderings(records):
+    """Records of each matrix, arithmetic and ranks x threads layout, ranked
+    by factorization time ("rank"), the failed runs last."""
+    def factorization(record):
+        return record.get("factorization_wall") or \
+            record.get("factorization_time")
+
+    groups={}
+    for record in records:
+        key=(record.get("matrix") or record.get("file"),record.get("arith"),
+            record.get("ranks") or record.get("nprocs"),
+            record.get("threads") or record.get("nthreads"))
+        groups.setdefault(key,[]).append(record)
+    ranked=[]
+    for key in sorted(groups,key=str):
+        done=[record for record in groups[key]
+            if record.get("status","ok")=="ok" and factorization(record)]
+        done.sort(key=factorization)
+        ranked+=[dict(record,rank=k+1) for k,record in enumerate(done)]
+        ranked+=[record for record in groups[key] if record not in done]
+    return ranked
+
+
+def print_table(records, fields=SHOW_FIELDS):
+    """Print the records as a table of the `fields` found in them."""
+    fields=[field for field in fields if any(record.get(field) is not None
+        for record in records)]
+    rows=[[format_value(record.get(field)) for field in fields]
+        for record in records]
+    widths=[max([len(field)]+[len(row[k]) for row in rows])
+        for k,field in enumerate(fields)]
+    print("  ".join(field.rjust(width) for field,width in zip(fields,widths)))
+    print("-"*(sum(widths)+2*len(widths)-2))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value,width in zip(row,widths)))
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if isinstance(value,float):
+        return "%.4g" % value
+    if isinstance(value,list):
+        return " ".join(format_value(item) for item in value)
+    # file names are shortened, not the directories and descriptions
+    if isinstance(value,str) and os.sep in value and \
+        not re.search(r"\s",value) and not os.path.isdir(value):
+        return os.path.basename(value)
+    return str(value)
+
+
+parser = ArgumentParser(description="Run sweeps of dsimpletest")
+
+parser.add_argument("matrices", nargs="*", metavar="FILE[:TYPE[:RHS]]",
+    help="Input files of dsimpletest; .mtx files default to type 3 with "
+    "FILE_rhs1.mtx, Harwell-Boeing files (.rua, .rsa, .rza, .hb, .rb) to "
+    "type 4, binary containers (save_sparse.py --binary) to type 5, the "
+    "others to type 1")
+
+parser.add_argument("-np","--ranks", dest="ranks", nargs="+", type=int,
+    default=[1], metavar="p", help="Numbers of MPI ranks [default value 1]")
+
+parser.add_argument("--threads", dest="threads", nargs="+", type=int,
+    default=[1], metavar="t",
+    help="Numbers of OpenMP threads per rank [default value 1]")
+
+parser.add_argument("--ordering", dest="orderings", nargs="+", default=["auto"],
+    choices=sorted(ORDERINGS,key=ORDERINGS.get)+sorted(PAR_ORDERINGS)+["all"],
+    metavar="o", help="Orderings: "+", ".join(sorted(ORDERINGS,
+    key=ORDERINGS.get))+" (ICNTL(7)), "+", ".join(sorted(PAR_ORDERINGS))+
+    " (parallel analysis, ICNTL(28)=2 and ICNTL(29)), or all for "+
+    " ".join(COMPARED_ORDERINGS)+" [default value auto]")
+
+parser.add_argument("--compare-orderings", dest="compare_orderings",
+    action="store_true", default=False, help="Time the analysis and the "
+    "factorization (--phases) with each ordering (--ordering all by default), "
+    "and rank the orderings of each matrix by factorization time; with "
+    "--show, rank the records")
+
+parser.add_argument("--repeat", dest="repeat", type=int, default=1,
+    metavar="r", help="Runs of each configuration [default value 1]")
+
+parser.add_argument("--binary", dest="binary",
+    default=os.path.join(HERE,"dsimpletest"),
+    help="dsimpletest executable, the ssimpletest, csimpletest and "
+    "zsimpletest drivers are taken next to it [default: dsimpletest next to "
+    "this script]")
+
+parser.add_argument("--arith", dest="ariths", nargs="+", default=["auto"],
+    choices=ARITHS, metavar="a",
+    help="Arithmetics: s, d, c, z, or auto for d, z with the complex Matrix "
+    "Market files [default value auto]")
+
+parser.add_argument("--ooc", dest="ooc_dirs", nargs="*", default=None,
+    metavar="DIR", help="Also factor the matrices out-of-core (ICNTL(22)=1, "
+    "dsimpletest --ooc) with the factors in each DIR, and compare the I/O "
+    "time and volume with the in-core runs (implies --phases); with --show, "
+    "print the comparison (no DIR needed)")
+
+parser.add_argument("--blr", dest="blr_tols", nargs="*", type=float,
+    default=None, metavar="EPS", help="Also factor the matrices in block "
+    "low-rank (ICNTL(35)=1, dsimpletest --blr) at each tolerance EPS "
+    "(CNTL(7)), and compare the flops, the factor size, the factorization "
+    "time and the residual with the full-rank runs (implies --phases); with "
+    "--show, print the comparison (no EPS needed)")
+
+parser.add_argument("--residual", dest="residual", type=int, default=None,
+    choices=(0,1,2), help="Error analysis ICNTL(11) of the solve "
+    "(dsimpletest --residual), 1: residual, backward errors and condition "
+    "numbers, 2: residual and backward errors only [default: 2 with --blr, "
+    "else 0]")
+
+parser.add_argument("--refine", dest="refine", type=int, default=0,
+    metavar="N", help="Iterative refinement ICNTL(10) of the solve, at most N "
+    "steps, or -N steps (dsimpletest --refine); its cost is the extra solve "
+    "time (--residual 1|2 and --refine imply --phases) [default value 0]")
+
+parser.add_argument("--determinant", dest="determinant",action="store_true",
+    default=False, help="Compute the determinant (ICNTL(33)=1, dsimpletest "
+    "--determinant)")
+
+parser.add_argument("--mem-relax", dest="mem_relax", type=int, default=None,
+    metavar="P", help="Relaxation ICNTL(14) of the memory estimate of MUMPS, "
+    "in percent (dsimpletest --mem-relax) [default: the default of MUMPS]")
+
+parser.add_argument("--sym", dest="sym", type=int, default=None,
+    choices=(0,1,2), help="SYM of MUMPS, 0: unsymmetric, 1: positive "
+    "definite, 2: symmetric (dsimpletest --sym) [default: 2 for the "
+    "symmetric Matrix Market and Harwell-Boeing inputs, 0 for the others]")
+
+parser.add_argument("--split", dest="split", nargs="+", type=int, default=None,
+    metavar="c", help="Core counts of which every ranks x threads split is "
+    "run, instead of --ranks x --threads")
+
+parser.add_argument("--launcher", dest="launcher", default="mpirun -np {ranks}",
+    help="MPI launcher, with the {ranks}, {threads} and {cpus} fields; empty "
+    "for sequential builds [default value 'mpirun -np {ranks}']")
+
+parser.add_argument("--cores", dest="cores", type=int,
+    default=multiprocessing.cpu_count(), metavar="c",
+    help="Cores shared by the concurrent runs [default: all the cores]")
+
+parser.add_argument("-j","--jobs", dest="jobs", type=int, default=0,
+    metavar="j", help="Maximum number of concurrent runs, 1 for exclusive "
+    "runs; 0 for as many as fit on the cores [default value 0]")
+
+parser.add_argument("--pin", dest="pin",action="store_true",default=False,
+    help="Restrict each run to its cores with taskset")
+
+parser.add_argument("--bind", dest="bind",action="store_true",default=False,
+    help="Bind the ranks with the --mpi-bind options of the launcher and their "
+    "threads with OMP_PLACES and OMP_PROC_BIND")
+
+parser.add_argument("--mpi-bind", dest="mpi_bind", default=MPI_BIND,
+    help="Binding options of the launcher for --bind, with the fields of "
+    "--launcher [default value '%s']" % MPI_BIND)
+
+parser.add_argument("--omp-places", dest="omp_places", default=OMP_PLACES,
+    help="OMP_PLACES for --bind [default value %s]" % OMP_PLACES)
+
+parser.add_argument("--omp-proc-bind", dest="omp_proc_bind",
+    default=OMP_PROC_BIND,
+    help="OMP_PROC_BIND for --bind [default value %s]" % OMP_PROC_BIND)
+
+parser.add_argument("-o","--outdir", dest="outdir", default="bench_results",
+    help="Directory of the logs and of the results [default value "
+    "bench_results]")
+
+parser.add_argument("--phases", dest="phases",action="store_true",
+    default=False,help="Run and time the analysis, the factorization and the "
+    "solve separately (dsimpletest --phases); with --show, print the "
+    "per-phase times and rates")
+
+parser.add_argument("--solves", dest="solves", type=int, default=0,
+    metavar="K", help="Factor once, then time K single solves and one "
+    "blocked solve of K RHS (dsimpletest --solves) [default value 0]")
+
+parser.add_argument("--distributed", dest="distributed",action="store_true",
+    default=False,help="Every rank reads its slice of the inputs, which must "
+    "be binary containers (dsimpletest --distributed, ICNTL(18)=3)")
+
+parser.add_argument("--show", dest="show",action="store_true",default=False,
+    help="Print the records of the given JSON lines or CSV files instead of "
+    "running")
+
+parser.add_argument("--csv", dest="csv", default=None, metavar="FILE",
+    help="Also write the records of the sweep as a CSV table in the output "
+    "directory")
+
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    if args.show:
+        for filename in args.matrices:
+            records=read_records(filename)
+            if args.compare_orderings:
+                print_table(rank_orderings(records),ORDERING_FIELDS)
+                continue
+            if args.ooc_dirs is not None:
+                print_table(compare_ooc(records),OOC_FIELDS)
+                continue
+            if args.blr_tols is not None:
+                print_table(compare_blr(records),BLR_FIELDS)
+                continue
+            print_table(records,PHASE_FIELDS if args.phases else SHOW_FIELDS)
+            solves=[record for record in records if record.get("nsolves")]
+            if solves:
+                print()
+                print_table(solves,SOLVE_FIELDS)
+            checked=[record for record in records if record.get("refine")
+                or record.get("error_analysis")]
+            if checked:
+                print()
+                print_table(checked,ACCURACY_FIELDS)
+            print_best(records)
+        parser.exit()
+    if not args.matrices:
+        parser.error("no input matrix")
+    if args.compare_orderings:
+        args.phases=True
+        if args.orderings==["auto"]:
+            args.orderings=["all"]
+    ooc_dirs=[None]
+    if args.ooc_dirs==[]:
+        parser.error("--ooc needs a directory")
+    if args.ooc_dirs:
+        args.phases=True
+        ooc_dirs+=[os.path.abspath(path) for path in args.ooc_dirs]
+        for path in args.ooc_dirs:
+            if not os.path.isdir(path):
+                parser.error("no directory %s" % path)
+    blr_tols=[None]
+    if args.blr_tols==[]:
+        parser.error("--blr needs a tolerance")
+    if args.blr_tols:
+        args.phases=True
+        blr_tols+=args.blr_tols
+    if "all" in args.orderings:
+        args.orderings=COMPARED_ORDERINGS+[ordering for ordering in
+            args.orderings if ordering not in COMPARED_ORDERINGS+["all"]]
+    layouts=None
+    if args.split:
+        layouts=[layout for cores in args.split for layout in splits(cores)]
+    runs=sweep([parse_matrix(spec) for spec in args.matrices],args.ranks,
+        args.threads,args.orderings,args.repeat,args.ariths,layouts,ooc_dirs,
+        blr_tols)
+    print("%d runs on %d cores" % (len(runs),args.cores))
+    options=["--phases"] if args.phases else []
+    if args.solves:
+        options+=["--solves",str(args.solves)]
+    if args.distributed:
+        options.append("--distributed")
+    if args.sym is not None:
+        options+=["--sym",str(args.sym)]
+    if args.mem_relax is not None:
+        options+=["--mem-relax",str(args.mem_relax)]
+    if args.residual is None and args.blr_tols:
+        # residual of the full-rank runs too
+        args.residual=2
+    if args.residual is not None:
+        options+=["--residual",str(args.residual)]
+    if args.refine:
+        options+=["--refine",str(args.refine)]
+    if args.determinant:
+        options.append("--determinant")
+    bind=None
+    if args.bind:
+        bind={"mpi":args.mpi_bind,"places":args.omp_places,
+            "proc_bind":args.omp_proc_bind}
+    records=run_sweep(runs,args.binary,args.launcher,args.cores,args.outdir,
+        args.jobs,args.pin,table=args.csv,options=options,bind=bind)
+    if args.compare_orderings:
+        print()
+        print_table(rank_orderings(records),ORDERING_FIELDS)
+    else:
+        print_best(records)
+    if args.ooc_dirs:
+        print()
+        print_table(compare_ooc(records),OOC_FIELDS)
+    if args.blr_tols:
+        print()
+        print_table(compare_blr(records),BLR_FIELDS)
+    if args.residual or args.refine:
+        print()
+        print_table(records,ACCURACY_FIELDS)
+    flagged=[record for record in records if record.get("mem_flags")]
+    if flagged:
+        print()
+        print("Runs above the memory estimate of MUMPS:")
+        print_table(flagged,MEMORY_FIELDS)
@@ -22,101 +22,1399 @@ Ax=b linear system
 """http://stackoverflow.com/questions/6282432/load-sparse-array-from-npy-file
 """
 
+import gzip
+import io
+import lzma
+import os
 import random
+import shutil
+import struct
+import subprocess
+import tempfile
 import scipy.sparse as sparse
 import scipy.io
 import multiprocessing
 import numpy as np
 from argparse import ArgumentParser
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from itertools import chain, islice
 import time
 
-def save_sparse_matrix(filename,n,density, rhs=False):
+import matrix_cache
+
+# Version of the generated inputs, part of the matrix cache keys: to increase
+# whenever the same parameters no longer give the same files
+GENERATOR_VERSION=1
+
+# Bounds of the random values of A and b
+LB=-100
+UB=101
+
+# Number of records formatted per write: bounds the size of the text buffer
+# whatever the number of nonzeros
+CHUNK_SIZE=1<<16
+
+# Number of lines parsed at once by the loader
+READ_LINES=1<<18
+
+# Expected number of nonzeros per row block in streaming mode: bounds the
+# memory of the generator whatever the size of the matrix
+BLOCK_NNZ=1<<20
+# Largest population accepted by numpy's multivariate hypergeometric draw
+HYPERGEOMETRIC_MAX=10**9
+
+# Binary container (version 1), little-endian, read by mpiread.f and by
+# dsimpletest.F (type 5, which needs the RHS section and 4-byte integers):
+#
+#   offset  type        field
+#   0       char[8]     magic "MUMPSBIN"
+#   8       int64       version
+#   16      int64       N
+#   24      int64       NNZ
+#   32      int64       size in bytes of the IRN/JCN integers (4 or 8)
+#   40      int64       NRHS (0 or 1)
+#   48      int64       offset of IRN
+#   56      int64       offset of JCN
+#   64      int64       offset of A
+#   72      int64       offset of RHS (0 without RHS)
+#   80      int64[6]    reserved, 0
+#
+# IRN(NNZ) and JCN(NNZ) are 1-based integers, A(NNZ) and RHS(N*NRHS) are
+# doubles. Every section starts on a multiple of BINARY_ALIGN bytes, so that
+# each MPI rank can read its slice of a section with one MPI_FILE_READ_AT_ALL.
+BINARY_MAGIC=b"MUMPSBIN"
+BINARY_VERSION=1
+BINARY_ALIGN=4096
+BINARY_HEADER=struct.Struct("<8s15q")
+BINARY_FIELDS=("version","n","nnz","index_size","nrhs","irn","jcn","a","rhs")
+
+
+def print_banner(text):
+    """Print `text` inside a box of '#'."""
+    str_time="# "+text+" #"
+    seperators="#"*len(str_time)
+    empty_sep="#"+" "*(len(str_time)-2)+"#"
+
+    print(seperators)
+    print(empty_sep)
+    print(str_time)
+    print(empty_sep)
+    print(seperators)
+
+
+def format_triplets(row, col, data, sep="\t"):
+    """Format 0-based COO triplets as the "\\ni\\tj\\tv" records read by dsimpletest.
+
+    Indices are shifted by 1 (MUMPS/Fortran indexing) and values are written
+    with repr(), which gives the same text as str() on the numpy scalars.
+    Every value is still formatted by Python: the chunk is built by a single
+    %-operation instead of one string and one write() per record, which
+    measured 1.4 to 2.3x faster than the record loop (bench_save_sparse.py).
+    The shortest repr() of the floats is the cost; numpy's astype(str) and
+    np.char were slower here and np.savetxt (%.17g) changes the text.
+    """
+    records=zip((row+1).tolist(),(col+1).tolist(),data.tolist())
+    record="\n%d"+sep+"%d"+sep+"%r"
+    return (record*len(data)) % tuple(chain.from_iterable(records))
+
+
+def write_triplets(file, row, col, data, chunk=CHUNK_SIZE, sep="\t"):
+    """Write the COO triplets to `file` by blocks of `chunk` records."""
+    for start in range(0,len(data),chunk):
+        stop=start+chunk
+        file.write(format_triplets(row[start:stop],col[start:stop],
+            data[start:stop],sep))
+
+
+def write_rhs(file, rhs, chunk=CHUNK_SIZE):
+    """Write the RHS values to `file`, one "\\nv" record per value."""
+    for start in range(0,len(rhs),chunk):
+        block=rhs[start:start+chunk].tolist()
+        file.write(("\n%r"*len(block)) % tuple(block))
+
+
+def save_sparse_matrix(filename,n,density, rhs=False, seed=None, fmt="text",
+    diagonal="none", solution=False, compression=None):
     start_time = time.time()
     print("Generating Sparse matrix......")
-    x=sparse.rand(n,n,density=density)
-    x_coo = x.tocoo()
-    NNZ = x.nnz#int(n*n*density)
-    LB=-100
-    UB=101
-    row = x.row#np.random.randint(0,n,NNZ)
-    col = x.col#np.random.randint(0,n,NNZ)
-    data = np.random.uniform(LB,UB,NNZ)
+    rng=np.random.RandomState(seed)
+    x=sparse.rand(n,n,density=density,format="coo",random_state=rng)
+    row = x.row
+    col = x.col
+    data = rng.uniform(LB,UB,x.nnz)
+    if diagonal!="none":
+        row,col,data=add_diagonal(row,col,data,0,n,rng.uniform(LB,UB,n))
+        if diagonal=="dominant":
+            data=dominant_diagonal(row,col,data,0,n)
+    NNZ = len(data)
 
+    y=None
+    if solution:
+        xtrue=rng.uniform(-1,1,n)
+        y=np.bincount(row,weights=data*xtrue[col],minlength=n)
+        save_solution(filename,xtrue)
+    elif rhs:
+        y=rng.uniform(LB,UB,n)
 
-    with open(filename,"w") as file:
+    if fmt!="text":
+        if fmt=="binary":
+            save_binary_matrix(filename,n,row,col,data,y)
+        else:
+            save_mm_matrix(filename,sparse.coo_matrix((data,(row,col)),
+                shape=(n,n)),y,compression=compression)
+        elapsed_time = time.time() - start_time
+        print_banner("Sparse File Generation time:"+str(elapsed_time)+"s")
+        return
+
+    with open_output(output_filename(filename,compression),compression) as file:
 
         file.write(str(n)+"\n")
         file.write(str(NNZ))
         print('Saving Generated Sparse matrix...')
 
-        for i in range(NNZ):#we add 1 so we can be comptatible with MUMPS/Fortran indexing that starts at 1
-            tmp="\n"+str(row[i]+1)+"\t"+str(col[i]+1)+"\t"+str(data[i])
-            file.write(tmp)     
+        #we add 1 so we can be comptatible with MUMPS/Fortran indexing that starts at 1
+        write_triplets(file,row,col,data)
 
-        if rhs : 
+        if y is not None :
             print("Generating RHS......")
-            y=np.random.uniform(LB,UB,n)
-            for j in range(n):
-                tmp="\n"+str(y[j])
-                file.write(tmp)
+            write_rhs(file,y)
 
         file.write("\n")
-        elapsed_time = time.time() - start_time
-        str_time="# Sparse File Generation time:"+str(elapsed_time)+"s #"
-        seperators="#"
-        empty_sep ="#"
-        for k in range(len(str_time)-2):
-            seperators+="#"
-            empty_sep +=" "
-        seperators+="#"
-        empty_sep +="#"
+    elapsed_time = time.time() - start_time
+    print_banner("Sparse File Generation time:"+str(elapsed_time)+"s")
+
+
+
+def add_diagonal(row, col, data, first, last, values):
+    """Replace the diagonal entries of the rows [first,last) by `values`.
+
+    The result is sorted by row then column.
+    """
+    off=row!=col
+    k=np.arange(first,last,dtype=np.int64)
+    row=np.concatenate((row[off],k))
+    col=np.concatenate((col[off],k))
+    data=np.concatenate((data[off],values))
+    order=np.lexsort((col,row))
+    return row[order],col[order],data[order]
+
+
+def dominant_diagonal(row, col, data, first, last):
+    """Set the diagonal of the rows [first,last) to the sum of the absolute
+    values of the row plus one, making them strictly diagonally dominant.
+
+    The diagonal entries must be present.
+    """
+    diag=row==col
+    weights=np.where(diag,0.,np.abs(data))
+    rowsum=np.bincount(row-first,weights=weights,minlength=last-first)
+    data=np.array(data,dtype=np.float64)
+    data[diag]=rowsum[row[diag]-first]+1.
+    return data
+
+
+def solution_filename(filename):
+    """Name of the file storing the manufactured solution of `filename`."""
+    return filename+".xtrue.npy"
+
+
+def manufactured_solution(seed, index):
+    """Entries `index` of the manufactured solution x_true, in [-1,1)."""
+    return 2*hash_uniform(seed+2,index,0)-1
+
+
+def save_solution(filename, xtrue):
+    """Save x_true next to the input file `filename`."""
+    np.save(solution_filename(filename),np.asarray(xtrue,dtype=np.float64))
+
+
+def load_solution(filename):
+    """Memory-map the manufactured solution of the input file `filename`."""
+    return np.load(solution_filename(filename),mmap_mode="r")
+
+
+def block_rng(seed, index):
+    """Independent random stream of the row block `index` for `seed`."""
+    return np.random.default_rng(np.random.SeedSequence(seed,spawn_key=(index,)))
+
+
+def split_rows(n, block_rows):
+    """Return the (first, last+1) rows of the blocks of `block_rows` rows."""
+    return [(start,min(start+block_rows,n)) for start in range(0,n,block_rows)]
+
+
+def default_block_rows(n, density):
+    """Number of rows per block so that a block holds about BLOCK_NNZ entries."""
+    return int(min(n,max(1,BLOCK_NNZ//max(n*density,1))))
+
+
+def block_counts(n, density, blocks, seed, diagonal=False):
+    """Draw the number of nonzeros of each row block.
+
+    The total is the NNZ of sparse.rand, round(density*n*n), and it is split
+    among the blocks as if the positions were drawn on the whole matrix, so
+    the header can be written before any block is generated. With `diagonal`
+    the n diagonal entries are part of the total and the counts are those of
+    the off-diagonal entries.
+    """
+    nnz=int(round(density*n*n))
+    width=n
+    if diagonal:
+        nnz=max(nnz-n,0)
+        width=n-1
+    sizes=np.array([(last-first)*width for first,last in blocks],dtype=np.int64)
+    rng=np.random.default_rng(seed)
+    if sizes.sum()<HYPERGEOMETRIC_MAX:
+        return rng.multivariate_hypergeometric(sizes,nnz,method="marginals")
+    # numpy limits the hypergeometric population: for such sizes the density
+    # is tiny and the multinomial split is the same in practice
+    return rng.multinomial(nnz,sizes/float(sizes.sum()))
+
+
+def generate_block(n, first, last, count, rng, diagonal=False):
+    """Draw `count` distinct nonzeros in rows [first,last), sorted by row.
+
+    With `diagonal` the `count` entries are drawn off the diagonal and the
+    diagonal entries of the rows are added. Returns the 0-based row and column
+    indices and the values.
+    """
+    if not diagonal:
+        pos=np.sort(rng.choice((last-first)*n,size=count,replace=False,
+            shuffle=False))
+        row=(first+pos//n).astype(np.int64)
+        col=(pos%n).astype(np.int64)
+        data=rng.uniform(LB,UB,count)
+        return row,col,data
+    pos=rng.choice((last-first)*(n-1),size=count,replace=False,shuffle=False)
+    row=(first+pos//(n-1)).astype(np.int64)
+    col=(pos%(n-1)).astype(np.int64)
+    col+=col>=row
+    data=rng.uniform(LB,UB,count)
+    return add_diagonal(row,col,data,first,last,rng.uniform(LB,UB,last-first))
+
+
+def block_task(task):
+    """Generate the row block described by `task`, a tuple
+    (params, first, last, count, seed, index) where `params` holds the kind of
+    matrix and its options (see structured_params)."""
+    params,first,last,count,seed,index=task
+    diagonal=params.get("diagonal","none")
+    if params["kind"]=="random":
+        row,col,data=generate_block(params["n"],first,last,count,
+            block_rng(seed,index),diagonal!="none")
+    else:
+        row,col,data=structured_block(params,first,last,seed)
+    if diagonal=="dominant" and params["kind"] not in STENCILS:
+        data=dominant_diagonal(row,col,data,first,last)
+    return row,col,data
+
+
+def block_rhs(task, row, col, data):
+    """Rows of A*x_true for the block of `task`, None without manufactured
+    solution."""
+    params,first,last,count,seed,index=task
+    if not params.get("solution"):
+        return None
+    xtrue=manufactured_solution(seed,col)
+    return np.bincount(row-first,weights=data*xtrue,minlength=last-first)
+
+
+def lower_triangle(row, col, data):
+    """Keep the entries on and below the diagonal."""
+    lower=row>=col
+    return row[lower],col[lower],data[lower]
+
+
+def array_block(task):
+    """Return the (row, col, data) arrays of the block of `task` and its rows
+    of A*x_true.
+
+    With params["lower"] only the lower triangle is returned, A*x_true being
+    computed on the full rows.
+    """
+    row,col,data=block_task(task)
+    b=block_rhs(task,row,col,data)
+    if task[0].get("lower"):
+        row,col,data=lower_triangle(row,col,data)
+    return (row,col,data),b
+
+
+def format_block(file, task):
+    """Write the text records of the block of `task` to `file`, with the Matrix
+    Market separators if params["mm"], and return its rows of A*x_true."""
+    (row,col,data),b=array_block(task)
+    write_triplets(file,row,col,data,sep=" " if task[0].get("mm") else "\t")
+    return b
+
+
+def chunk_block(directory, task):
+    """Format the block of `task` into its own file of `directory`; return the
+    file name and the rows of A*x_true of the block."""
+    name=os.path.join(directory,"block%d.txt" % task[5])
+    with open(name,"w") as file:
+        b=format_block(file,task)
+    return name,b
+
+
+def write_text_blocks(file, tasks, workers, directory, pieces):
+    """Write the text records of the blocks of `tasks` to `file` and append
+    their rows of A*x_true to `pieces`.
+
+    With `workers` > 1 each worker formats its blocks into temporary files of
+    `directory` and the parent only appends their bytes to `file`, in order.
+    """
+    if workers<=1:
+        for task in tasks:
+            pieces.append(format_block(file,task))
+        return
+    chunks=tempfile.mkdtemp(prefix=".blocks",dir=directory)
+    try:
+        file.flush()
+        for name,b in iter_blocks(partial(chunk_block,chunks),tasks,workers):
+            with open(name,"rb") as chunk:
+                shutil.copyfileobj(chunk,file.buffer,CHUNK_SIZE)
+            os.remove(name)
+            pieces.append(b)
+    finally:
+        shutil.rmtree(chunks)
+
+
+def ordered_imap(pool, func, tasks, window):
+    """Like pool.imap, with at most `window` results waiting to be consumed."""
+    pending=deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func,(task,)))
+        if len(pending)>=window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def iter_blocks(func, tasks, workers):
+    """Yield func(task) for each task in order, using `workers` processes."""
+    if workers<=1:
+        for task in tasks:
+            yield func(task)
+        return
+    print("Using",workers,"workers...")
+    pool=multiprocessing.Pool(workers)
+    try:
+        for result in ordered_imap(pool,func,tasks,2*workers):
+            yield result
+    finally:
+        pool.terminate()
+
+
+def write_blocks(filename, n, nnz, tasks, rhs, rhs_rng, workers=1, fmt="text",
+    compression=None):
+    """Write the header, the row blocks described by `tasks` and the RHS in the
+    `fmt` format: "text" (triplets), "binary" (container) or "mm" (Matrix
+    Market, the RHS going to rhs_filename(filename)). Text files are
+    compressed on the fly by `compression` (see compression_params).
 
-        print(seperators)
-        print(empty_sep)
-        print(str_time)
-        print(empty_sep)
-        print(seperators)
+    The RHS is drawn from `rhs_rng`, or is A*x_true if the tasks ask for a
+    manufactured solution; x_true is then saved next to `filename`.
+    """
+    solution=tasks[0][0].get("solution") if tasks else False
+    rhs=rhs or solution
+    pieces=[]
+    directory=os.path.dirname(os.path.abspath(filename))
 
+    def rhs_chunks():
+        if solution:
+            for b in pieces:
+                yield b
+        else:
+            for first in range(0,n,CHUNK_SIZE):
+                yield rhs_rng.uniform(LB,UB,min(CHUNK_SIZE,n-first))
 
+    if fmt=="binary":
+        layout=binary_layout(n,nnz,rhs)
+        with open(filename,"wb") as file:
+            write_binary_header(file,layout)
+            pos=0
+            for (row,col,data),b in iter_blocks(array_block,tasks,workers):
+                write_binary_block(file,layout,pos,row,col,data)
+                pos+=len(data)
+                pieces.append(b)
+            if rhs :
+                print("Generating RHS......")
+                file.seek(layout["rhs"])
+                for y in rhs_chunks():
+                    y.astype("<f8").tofile(file)
+            file.truncate(binary_size(layout))
+    elif fmt=="mm":
+        with open_output(output_filename(filename,compression),
+            compression) as file:
+            write_mm_header(file,n,n,nnz,tasks[0][0].get("lower"))
+            write_text_blocks(file,tasks,workers,directory,pieces)
+            file.write("\n")
+        if rhs :
+            print("Generating RHS......")
+            write_mm_rhs(rhs_filename(filename),n,rhs_chunks(),compression)
+    else:
+        with open_output(output_filename(filename,compression),
+            compression) as file:
+            file.write(str(n)+"\n")
+            file.write(str(nnz))
+            write_text_blocks(file,tasks,workers,directory,pieces)
+            if rhs :
+                print("Generating RHS......")
+                for y in rhs_chunks():
+                    write_rhs(file,y)
+            file.write("\n")
+
+    if solution:
+        print("Saving manufactured solution in",solution_filename(filename))
+        seed=tasks[0][4]
+        xtrue=np.lib.format.open_memmap(solution_filename(filename),mode="w+",
+            dtype=np.float64,shape=(n,))
+        for first in range(0,n,BLOCK_NNZ):
+            last=min(first+BLOCK_NNZ,n)
+            xtrue[first:last]=manufactured_solution(seed,
+                np.arange(first,last,dtype=np.int64))
+        del xtrue
+
+
+def stream_sparse_matrix(filename, n, density, rhs=False, seed=None,
+    block_rows=None, workers=1, fmt="text", diagonal="none", solution=False,
+    compression=None):
+    """Generate and save a random sparse matrix one row block at a time.
+
+    Peak memory depends on the block size, not on NNZ. With `workers` > 1 the
+    blocks are generated and formatted by a pool of processes, each block to
+    its own temporary file, and appended in order. The matrix is fully
+    determined by (n, density, seed, block_rows), whatever the number of
+    workers and the output format.
+
+    `diagonal` is "none", "full" (every diagonal entry is present) or
+    "dominant" (strictly diagonally dominant rows). With `solution` the RHS
+    is A*x_true for a manufactured x_true saved in FILE.xtrue.npy.
+    """
+    start_time = time.time()
+    if seed is None:
+        seed=np.random.SeedSequence().entropy
+    if block_rows is None:
+        block_rows=default_block_rows(n,density)
+    print("Seed:",seed," rows per block:",block_rows)
+
+    blocks=split_rows(n,block_rows)
+    counts=block_counts(n,density,blocks,seed,diagonal!="none")
+    NNZ=int(counts.sum())
+    if diagonal!="none":
+        NNZ+=n
+    params={"kind":"random","n":n,"diagonal":diagonal,"solution":solution,
+        "mm":fmt=="mm"}
+    tasks=[(params,first,last,counts[index],seed,index)
+        for index,(first,last) in enumerate(blocks)]
+    print('Streaming Sparse matrix in',len(blocks),'blocks...')
+
+    write_blocks(filename,n,NNZ,tasks,rhs,block_rng(seed,len(blocks)),
+        workers,fmt,compression)
+
+    elapsed_time = time.time() - start_time
+    print_banner("Sparse File Generation time:"+str(elapsed_time)+"s")
+    return seed
+
+
+#-------------------------------------------------------------------------------
+# Structured matrices: the pattern of a block of rows is built with array
+# operations and the values are a hash of (seed, row, col), so that they do not
+# depend on the block size and symmetric variants stay symmetric across blocks.
+
+# Stencil offsets (di, dj, dk) on a nx*ny*nz grid, the center included
+STENCILS={
+    "laplace5":[(0,0,0),(-1,0,0),(1,0,0),(0,-1,0),(0,1,0)],
+    "laplace7":[(0,0,0),(-1,0,0),(1,0,0),(0,-1,0),(0,1,0),(0,0,-1),(0,0,1)],
+    "laplace27":[(di,dj,dk) for dk in (-1,0,1) for dj in (-1,0,1)
+        for di in (-1,0,1)],
+}
+STRUCTURED_KINDS=("laplace5","laplace7","laplace27","banded","blockdiag")
+
+
+def hash_uniform(seed, i, j):
+    """Uniform values in [0,1), a deterministic function of (seed, i, j).
+
+    splitmix64 finalizer applied twice, on uint64 arrays (wrapping arithmetic).
+    """
+    def mix(x):
+        x=x^(x>>np.uint64(30))
+        x=x*np.uint64(0xBF58476D1CE4E5B9)
+        x=x^(x>>np.uint64(27))
+        x=x*np.uint64(0x94D049BB133111EB)
+        return x^(x>>np.uint64(31))
 
-def load_sparse_matrix(filename, rhs=False):
+    key=np.uint64(seed%2**64)
+    x=mix(np.asarray(i,dtype=np.uint64)^key)
+    x=mix(x+np.asarray(j,dtype=np.uint64)*np.uint64(0x9E3779B97F4A7C15))
+    return (x>>np.uint64(11))*(1.0/2**53)
+
+
+def grid_shape(kind, n, grid=None):
+    """Return the (nx, ny, nz) grid of a stencil matrix.
+
+    Without `grid`, the grid is the square (laplace5) or cube closest to n
+    unknowns.
+    """
+    dim=2 if kind=="laplace5" else 3
+    if grid:
+        shape=list(grid)+[1]*(3-len(grid))
+    else:
+        side=max(1,int(round(n**(1.0/dim))))
+        shape=[side]*dim+[1]*(3-dim)
+    return tuple(int(s) for s in shape)
+
+
+def structured_params(kind, n, grid=None, bandwidth=10, fill=1.0,
+    block_size=100, coupling=0.01, spd=False, diagonal="none", solution=False):
+    """Gather the options of a structured matrix in a (picklable) dict.
+
+    - laplace5/laplace7/laplace27: finite difference Laplacian on `grid`,
+      symmetric positive definite
+    - banded: nonzeros within `bandwidth` of the diagonal, a fraction `fill`
+      of the band positions being kept (symmetric pattern)
+    - blockdiag: dense diagonal blocks of `block_size` rows, coupled to the
+      neighbour blocks by a fraction `coupling` of their positions
+
+    `spd` makes the banded and blockdiag values symmetric and diagonally
+    dominant with a positive diagonal. `diagonal` and `solution` are the
+    options of stream_sparse_matrix; the diagonal of these patterns is always
+    full.
+    """
+    params={"kind":kind,"n":n,"bandwidth":bandwidth,"fill":fill,
+        "block_size":block_size,"coupling":coupling,"spd":spd,
+        "diagonal":diagonal,"solution":solution}
+    if kind in STENCILS:
+        params["grid"]=grid_shape(kind,n,grid)
+        params["n"]=int(np.prod(params["grid"]))
+    return params
+
+
+def row_nnz(params):
+    """Expected number of nonzeros per row of a structured matrix."""
+    kind=params["kind"]
+    if kind in STENCILS:
+        return len(STENCILS[kind])
+    if kind=="banded":
+        return 1+2*params["bandwidth"]*params["fill"]
+    return params["block_size"]*(1+2*params["coupling"])
+
+
+def sort_pattern(row, col):
+    """Sort the (row, col) pairs by row then column."""
+    order=np.lexsort((col,row))
+    return row[order],col[order]
+
+
+def stencil_pattern(params, first, last):
+    """Pattern of the rows [first,last) of a stencil matrix."""
+    nx,ny,nz=params["grid"]
+    k=np.arange(first,last,dtype=np.int64)
+    i=k%nx
+    j=(k//nx)%ny
+    l=k//(nx*ny)
+    rows=[]
+    cols=[]
+    for di,dj,dk in STENCILS[params["kind"]]:
+        ii=i+di
+        jj=j+dj
+        ll=l+dk
+        mask=(ii>=0)&(ii<nx)&(jj>=0)&(jj<ny)&(ll>=0)&(ll<nz)
+        rows.append(k[mask])
+        cols.append((ii+nx*(jj+ny*ll))[mask])
+    return sort_pattern(np.concatenate(rows),np.concatenate(cols))
+
+
+def band_pattern(params, first, last, offsets, seed, fraction, keep):
+    """Pattern of the rows [first,last) among candidate columns `offsets`.
+
+    `offsets` is a (rows, m) array of candidate columns; the candidates inside
+    the matrix are kept where `keep` is True or, otherwise, for a fraction
+    `fraction` of them chosen symmetrically.
+    """
+    n=params["n"]
+    k=np.arange(first,last,dtype=np.int64)
+    row=np.repeat(k,offsets.shape[1])
+    col=offsets.ravel()
+    inside=(col>=0)&(col<n)
+    row,col,keep=row[inside],col[inside],keep.ravel()[inside]
+    if fraction<1:
+        draw=hash_uniform(seed+1,np.minimum(row,col),np.maximum(row,col))
+        keep=keep|(draw<fraction)
+    else:
+        keep=np.ones_like(keep)
+    return row[keep],col[keep]
 
-    data = []
-    row = []
-    col = []
 
-    with open(filename, "r") as file:
-        N=int(file.readline())
-        NNZ=int(file.readline())
+def structured_pattern(params, first, last, seed):
+    """Pattern of the rows [first,last) of a structured matrix, sorted by row."""
+    kind=params["kind"]
+    k=np.arange(first,last,dtype=np.int64)[:,None]
+    if kind in STENCILS:
+        return stencil_pattern(params,first,last)
+    if kind=="banded":
+        bandwidth=params["bandwidth"]
+        offsets=k+np.arange(-bandwidth,bandwidth+1)[None,:]
+        return band_pattern(params,first,last,offsets,seed,params["fill"],
+            offsets==k)
+    if kind=="blockdiag":
+        size=params["block_size"]
+        offsets=(k//size)*size+np.arange(-size,2*size)[None,:]
+        return band_pattern(params,first,last,offsets,seed,params["coupling"],
+            offsets//size==k//size)
+    raise ValueError("unknown kind of matrix: %s" % kind)
+
+
+def pattern_count(params, first, last, seed):
+    """Number of stored entries of the rows [first,last) of a structured
+    matrix."""
+    row,col=structured_pattern(params,first,last,seed)
+    if params.get("lower"):
+        return int(np.count_nonzero(row>=col))
+    return len(row)
+
+
+def is_symmetric(params):
+    """True if the values of the structured matrix are symmetric."""
+    return params["kind"] in STENCILS or params["spd"]
+
+
+def structured_values(params, row, col, first, last, seed):
+    """Values of the pattern (row, col) of the rows [first,last)."""
+    if params["kind"] in STENCILS:
+        return np.where(row==col,len(STENCILS[params["kind"]])-1.,-1.)
+    if not params["spd"]:
+        return LB+(UB-LB)*hash_uniform(seed,row,col)
+    data=2*hash_uniform(seed,np.minimum(row,col),np.maximum(row,col))-1
+    diag=row==col
+    weights=np.where(diag,0.,np.abs(data))
+    rowsum=np.bincount(row-first,weights=weights,minlength=last-first)
+    data[diag]=rowsum[row[diag]-first]+1.
+    return data
+
+
+def structured_block(params, first, last, seed):
+    """Generate the rows [first,last) of a structured matrix."""
+    row,col=structured_pattern(params,first,last,seed)
+    return row,col,structured_values(params,row,col,first,last,seed)
+
+
+def save_structured_matrix(filename, params, rhs=False, seed=None,
+    block_rows=None, workers=1, fmt="text", symmetric=False, compression=None):
+    """Generate and save a structured matrix (see structured_params) by row
+    blocks, like stream_sparse_matrix.
+
+    With `symmetric` (Matrix Market format only) the lower triangle of the
+    symmetric kinds is stored.
+    """
+    start_time = time.time()
+    if seed is None:
+        seed=np.random.SeedSequence().entropy
+    n=params["n"]
+    if block_rows is None:
+        block_rows=int(min(n,max(1,BLOCK_NNZ//row_nnz(params))))
+    print("Kind:",params["kind"]," N:",n," seed:",seed," rows per block:",
+        block_rows)
+
+    params=dict(params,mm=fmt=="mm",lower=symmetric)
+    if symmetric and (fmt!="mm" or not is_symmetric(params)):
+        raise ValueError("only the Matrix Market output of the Laplacians and"
+            " of the --spd matrices can be stored as symmetric")
+
+    blocks=split_rows(n,block_rows)
+    counts=[pattern_count(params,first,last,seed) for first,last in blocks]
+    NNZ=int(sum(counts))
+    tasks=[(params,first,last,counts[index],seed,index)
+        for index,(first,last) in enumerate(blocks)]
+    print('Streaming Sparse matrix in',len(blocks),'blocks...')
+
+    write_blocks(filename,n,NNZ,tasks,rhs,block_rng(seed,len(blocks)),
+        workers,fmt,compression)
+
+    elapsed_time = time.time() - start_time
+    print_banner("Sparse File Generation time:"+str(elapsed_time)+"s")
+    return seed
+
+
+
+def read_header(file):
+    """Read the N and NNZ lines of a sparse input file."""
+    N=int(file.readline())
+    NNZ=int(file.readline())
+    return N,NNZ
+
+
+def read_values(file, count):
+    """Parse the numbers of the next `count` lines of `file` (binary mode)."""
+    return np.fromstring(b"".join(islice(file,count)),sep=" ")
+
+
+def iter_triplets(file, nnz, chunk=READ_LINES, index_dtype=np.int32):
+    """Yield the `nnz` records following the header by chunks of `chunk` lines.
+
+    Each chunk is a (row, col, data) tuple of typed arrays, with 0-based
+    indices.
+    """
+    for start in range(0,nnz,chunk):
+        count=min(chunk,nnz-start)
+        values=read_values(file,count)
+        if values.size!=3*count:
+            raise ValueError("expected %d triplets after record %d, got %d values"
+                % (count,start,values.size))
+        values=values.reshape(count,3)
+        yield ((values[:,0]-1).astype(index_dtype),
+            (values[:,1]-1).astype(index_dtype),values[:,2].copy())
+
+
+def read_rhs(file, n):
+    """Read the `n` RHS values, as "value" (typefile=2) or "index value"
+    (typefile=1) lines."""
+    values=read_values(file,n)
+    if values.size==2*n:
+        return values[1::2].copy()
+    if values.size!=n:
+        raise ValueError("expected %d RHS values, got %d" % (n,values.size))
+    return values
+
+
+def new_array(mmap_dir, name, size, dtype):
+    """Allocate an array in memory, or as a .npy memmap in `mmap_dir`."""
+    if mmap_dir is None:
+        return np.empty(size,dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(mmap_dir,name+".npy"),
+        mode="w+",dtype=dtype,shape=(size,))
+
+
+def load_sparse_matrix(filename, rhs=False, mmap_dir=None, dense=False):
+    """Load a sparse input file written by save_sparse_matrix.
+
+    The records are parsed by chunks into typed arrays (int32 indices unless N
+    needs int64, float64 values). With `mmap_dir` the IRN/JCN/A arrays are
+    .npy memmaps stored in that directory, so the matrix does not need to fit
+    in memory. The matrix is only densified and printed if `dense` is True.
+
+    Returns the COO matrix and the RHS (None unless `rhs`).
+    """
+    start_time = time.time()
+    y=None
+
+    with open_input(filename) as file:
+        N,NNZ=read_header(file)
         print ("N=",N," NNZ=",NNZ)
-        
-        for k in range(NNZ):
-            line=file.readline()
-            # line_array=line.split()
-            # print(line_array)
-            res=map(lambda x:(int(x[0])-1,int(x[1])-1,float(x[2])),[line.split()])
-            # print(res[0][2])
-            row.append(res[0][0]);col.append(res[0][1]);data.append(res[0][2])
-
-            # print(k,"=>",row[k],col[k],data[k])
+
+        index_dtype=np.int32 if N<2**31 else np.int64
+        row=new_array(mmap_dir,"irn",NNZ,index_dtype)
+        col=new_array(mmap_dir,"jcn",NNZ,index_dtype)
+        data=new_array(mmap_dir,"a",NNZ,np.float64)
+
+        pos=0
+        for r,c,d in iter_triplets(file,NNZ,index_dtype=index_dtype):
+            row[pos:pos+len(d)]=r
+            col[pos:pos+len(d)]=c
+            data[pos:pos+len(d)]=d
+            pos+=len(d)
+
         if rhs:
-            y=[]
-            for k in range(N):
-                line=file.readline()
-                y.append(float(line))
+            y=read_rhs(file,N)
 
     M=sparse.coo_matrix((data,(row,col)),shape=(N,N))
 
-    
     print("REAL NNZ:",M.nnz)
-    print("-----------------------------------------------")
-    print(M)
-    print("-----------------------------------------------")
-    print(M.todense())
-    print("-----------------------------------------------")
+    if dense:
+        print("-----------------------------------------------")
+        print(M.todense())
+        print("-----------------------------------------------")
+        if rhs:
+            print(y)
+    elapsed_time = time.time() - start_time
+    print_banner("Sparse File Loading time:"+str(elapsed_time)+"s")
+    return M,y
+
+
+
+def align(offset, alignment=BINARY_ALIGN):
+    """Round `offset` up to a multiple of `alignment`."""
+    return -(-offset//alignment)*alignment
+
+
+def binary_layout(n, nnz, rhs=False):
+    """Return the header fields of a binary container, section offsets included."""
+    index_size=4 if n<2**31 else 8
+    layout={"version":BINARY_VERSION,"n":n,"nnz":nnz,"index_size":index_size,
+        "nrhs":1 if rhs else 0}
+    layout["irn"]=align(BINARY_HEADER.size)
+    layout["jcn"]=align(layout["irn"]+nnz*index_size)
+    layout["a"]=align(layout["jcn"]+nnz*index_size)
+    layout["rhs"]=align(layout["a"]+nnz*8) if rhs else 0
+    return layout
+
+
+def binary_size(layout):
+    """Size in bytes of the binary container described by `layout`."""
+    if layout["nrhs"]:
+        return layout["rhs"]+layout["n"]*layout["nrhs"]*8
+    return layout["a"]+layout["nnz"]*8
+
+
+def index_dtype(layout):
+    """Numpy type of the IRN/JCN sections."""
+    return np.dtype("<i%d" % layout["index_size"])
+
+
+def write_binary_header(file, layout):
+    """Write the header of a binary container at the beginning of `file`."""
+    file.seek(0)
+    fields=[layout[name] for name in BINARY_FIELDS]
+    file.write(BINARY_HEADER.pack(BINARY_MAGIC,*(fields+[0]*6)))
+
+
+def read_binary_header(file):
+    """Read and check the header of a binary container."""
+    fields=BINARY_HEADER.unpack(file.read(BINARY_HEADER.size))
+    if fields[0]!=BINARY_MAGIC:
+        raise ValueError("not a binary sparse file")
+    layout=dict(zip(BINARY_FIELDS,fields[1:]))
+    if layout["version"]!=BINARY_VERSION:
+        raise ValueError("unsupported binary sparse file version %d"
+            % layout["version"])
+    return layout
+
+
+def is_binary_file(filename):
+    """True if `filename` starts with the magic of the binary container."""
+    with open(filename,"rb") as file:
+        return file.read(len(BINARY_MAGIC))==BINARY_MAGIC
+
+
+def write_binary_block(file, layout, pos, row, col, data):
+    """Write 0-based COO triplets as the entries [pos,pos+len(data)) of the
+    IRN/JCN/A sections."""
+    dtype=index_dtype(layout)
+    file.seek(layout["irn"]+pos*layout["index_size"])
+    (row+1).astype(dtype).tofile(file)
+    file.seek(layout["jcn"]+pos*layout["index_size"])
+    (col+1).astype(dtype).tofile(file)
+    file.seek(layout["a"]+pos*8)
+    np.asarray(data,dtype="<f8").tofile(file)
+
+
+def save_binary_matrix(filename, n, row, col, data, rhs=None):
+    """Save 0-based COO triplets and an optional RHS as a binary container."""
+    layout=binary_layout(n,len(data),rhs is not None)
+    with open(filename,"wb") as file:
+        write_binary_header(file,layout)
+        for start in range(0,len(data),BLOCK_NNZ):
+            stop=start+BLOCK_NNZ
+            write_binary_block(file,layout,start,row[start:stop],
+                col[start:stop],data[start:stop])
+        if rhs is not None:
+            file.seek(layout["rhs"])
+            np.asarray(rhs,dtype="<f8").tofile(file)
+        file.truncate(binary_size(layout))
+
+
+def open_binary_matrix(filename):
+    """Memory-map the sections of a binary container.
+
+    Returns the header fields and read-only memmaps of IRN, JCN (1-based, as
+    stored), A and RHS (None without RHS); nothing is read until used.
+    """
+    with open(filename,"rb") as file:
+        layout=read_binary_header(file)
+    n,nnz=layout["n"],layout["nnz"]
+
+    def section(name, dtype, size):
+        if size==0:
+            return np.zeros(0,dtype=dtype)
+        return np.memmap(filename,dtype=dtype,mode="r",offset=layout[name],
+            shape=(size,))
+
+    irn=section("irn",index_dtype(layout),nnz)
+    jcn=section("jcn",index_dtype(layout),nnz)
+    a=section("a","<f8",nnz)
+    y=section("rhs","<f8",n*layout["nrhs"]) if layout["nrhs"] else None
+    return layout,irn,jcn,a,y
+
+
+def load_binary_matrix(filename, rhs=False, dense=False):
+    """Load a binary container as a COO matrix and its RHS (None unless `rhs`).
+
+    The values stay memory-mapped, only the indices are copied to shift them
+    to 0-based.
+    """
+    start_time = time.time()
+    layout,irn,jcn,a,y=open_binary_matrix(filename)
+    N=layout["n"]
+    print ("N=",N," NNZ=",layout["nnz"])
+    if rhs and y is None:
+        raise ValueError("%s has no RHS section" % filename)
+
+    M=sparse.coo_matrix((a,(irn-1,jcn-1)),shape=(N,N))
+    y=np.array(y) if rhs else None
+
+    print("REAL NNZ:",M.nnz)
+    if dense:
+        print("-----------------------------------------------")
+        print(M.todense())
+        print("-----------------------------------------------")
+        if rhs:
+            print(y)
+    elapsed_time = time.time() - start_time
+    print_banner("Sparse File Loading time:"+str(elapsed_time)+"s")
+    return M,y
+
+
+#-------------------------------------------------------------------------------
+# Matrix Market files, read by dsimpletest -t 3 through mmio.f
+
+MM_BANNER="%%MatrixMarket matrix "
+# Room left for a count that is only known once the file is written
+COUNT_WIDTH=20
+
+
+def rhs_filename(filename):
+    """Matrix Market RHS file of the matrix `filename`: foo.mtx -> foo_rhs1.mtx,
+    foo.mtx.gz -> foo_rhs1.mtx.gz."""
+    base,ext=split_codec(filename)
+    base=base[:-4] if base.endswith(".mtx") else base
+    return base+"_rhs1.mtx"+ext
+
+
+def is_mm_file(filename):
+    """True if `filename` starts with the Matrix Market banner, once
+    decompressed."""
+    with open_input(filename) as file:
+        return file.read(len(MM_BANNER)).lower()==MM_BANNER.lower().encode()
+
+
+def write_count(file, count):
+    """Write `count`, or leave room for it if None and return its position."""
+    if count is not None:
+        file.write(str(count))
+        return None
+    pos=file.tell()
+    file.write(" "*COUNT_WIDTH)
+    return pos
+
+
+def fill_count(file, pos, count):
+    """Write `count` in the room left by write_count at `pos`."""
+    file.seek(pos)
+    file.write(str(count).rjust(COUNT_WIDTH))
+
+
+def write_mm_header(file, rows, cols, nnz, symmetric=False):
+    """Write the banner and the size line of a coordinate real matrix.
+
+    Returns the position of the NNZ count (see write_count).
+    """
+    file.write(MM_BANNER+"coordinate real %s\n"
+        % ("symmetric" if symmetric else "general"))
+    file.write("%d %d " % (rows,cols))
+    return write_count(file,nnz)
+
+
+def read_mm_header(file):
+    """Read the banner, the comments and the size line of a Matrix Market file
+    opened in binary mode."""
+    banner=file.readline().split()
+    if len(banner)<5 or banner[0].lower()!=MM_BANNER.split()[0].lower().encode():
+        raise ValueError("not a Matrix Market file")
+    rep,field,symm=[word.decode().lower() for word in banner[2:5]]
+    line=file.readline()
+    while line.startswith(b"%") or not line.strip():
+        line=file.readline()
+    sizes=[int(value) for value in line.split()]
+    header={"rep":rep,"field":field,"symm":symm,"rows":sizes[0],
+        "cols":sizes[1]}
+    header["nnz"]=sizes[2] if rep=="coordinate" else sizes[0]*sizes[1]
+    return header
+
+
+def iter_mm_entries(file, header, chunk=READ_LINES, index_dtype=np.int64):
+    """Yield the coordinate entries of a Matrix Market file by chunks of
+    `chunk` lines, as (row, col, data) with 0-based indices."""
+    if header["rep"]!="coordinate" or header["field"] not in ("real",
+        "integer","pattern"):
+        raise ValueError("unsupported Matrix Market matrix: %s %s"
+            % (header["rep"],header["field"]))
+    width=2 if header["field"]=="pattern" else 3
+    nnz=header["nnz"]
+    for start in range(0,nnz,chunk):
+        count=min(chunk,nnz-start)
+        values=read_values(file,count)
+        if values.size!=width*count:
+            raise ValueError("expected %d entries after entry %d, got %d values"
+                % (count,start,values.size))
+        values=values.reshape(count,width)
+        data=values[:,2].copy() if width==3 else np.ones(count)
+        yield ((values[:,0]-1).astype(index_dtype),
+            (values[:,1]-1).astype(index_dtype),data)
+
+
+def expand_symmetric(row, col, data, symm="symmetric"):
+    """Add the upper triangle of a symmetric (or skew-symmetric) lower
+    triangle."""
+    off=row!=col
+    sign=-1. if symm=="skew-symmetric" else 1.
+    return (np.concatenate((row,col[off])),np.concatenate((col,row[off])),
+        np.concatenate((data,sign*data[off])))
+
+
+def write_mm_rhs(filename, n, chunks, compression=None):
+    """Write the RHS given by `chunks` of values as an array Matrix Market file."""
+    with open_output(output_filename(filename,compression),compression) as file:
+        file.write(MM_BANNER+"array real general\n")
+        file.write("%d 1" % n)
+        for y in chunks:
+            write_rhs(file,y)
+        file.write("\n")
+
+
+def read_mm_rhs(filename):
+    """Read the first column of an array Matrix Market file."""
+    with open_input(filename) as file:
+        header=read_mm_header(file)
+        if header["rep"]!="array":
+            raise ValueError("%s: expected an array Matrix Market file"
+                % filename)
+        return read_values(file,header["rows"])
+
+
+def save_mm_matrix(filename, M, rhs=None, symmetric=False, compression=None):
+    """Save a scipy sparse matrix (or a dense array) as a coordinate real
+    Matrix Market file, and `rhs` in rhs_filename(filename).
+
+    With `symmetric` only the lower triangle of M, assumed symmetric, is
+    stored.
+    """
+    M=sparse.coo_matrix(M)
+    row,col,data=M.row,M.col,M.data.astype(np.float64)
+    if symmetric:
+        row,col,data=lower_triangle(row,col,data)
+    with open_output(output_filename(filename,compression),compression) as file:
+        write_mm_header(file,M.shape[0],M.shape[1],len(data),symmetric)
+        write_triplets(file,row,col,data,sep=" ")
+        file.write("\n")
+    if rhs is not None:
+        write_mm_rhs(rhs_filename(filename),len(rhs),[np.asarray(rhs)],
+            compression)
+
+
+def load_mm_matrix(filename, rhs=False, expand=True, dense=False):
+    """Load a coordinate Matrix Market file as a COO matrix, and its RHS from
+    rhs_filename(filename) if `rhs`.
+
+    Symmetric storage is expanded to the full matrix unless `expand` is False.
+    """
+    start_time = time.time()
+    with open_input(filename) as file:
+        header=read_mm_header(file)
+        print ("N=",header["rows"]," NNZ=",header["nnz"]," ",header["symm"])
+        chunks=list(iter_mm_entries(file,header))
+    if chunks:
+        row,col,data=[np.concatenate(arrays) for arrays in zip(*chunks)]
+    else:
+        row,col,data=np.zeros(0,np.int64),np.zeros(0,np.int64),np.zeros(0)
+    if expand and header["symm"]!="general":
+        row,col,data=expand_symmetric(row,col,data,header["symm"])
+    M=sparse.coo_matrix((data,(row,col)),shape=(header["rows"],header["cols"]))
+    y=read_mm_rhs(rhs_filename(filename)) if rhs else None
+
+    print("REAL NNZ:",M.nnz)
+    if dense:
+        print(M.todense())
+        if rhs:
+            print(y)
+    elapsed_time = time.time() - start_time
+    print_banner("Sparse File Loading time:"+str(elapsed_time)+"s")
+    return M,y
+
+
+def save_triplet_matrix(filename, M, rhs=None, compression=None):
+    """Save a scipy sparse matrix (or a dense array) in the triplet format."""
+    M=sparse.coo_matrix(M)
+    with open_output(output_filename(filename,compression),compression) as file:
+        file.write(str(M.shape[0])+"\n")
+        file.write(str(M.nnz))
+        write_triplets(file,M.row,M.col,M.data.astype(np.float64))
+        if rhs is not None:
+            write_rhs(file,np.asarray(rhs,dtype=np.float64))
+        file.write("\n")
+
+
+def triplet_to_mm(src, dst, symmetric=False, rhs=False):
+    """Convert a triplet file to Matrix Market by chunks, storing only the lower
+    triangle if `symmetric`; the RHS goes to rhs_filename(dst)."""
+    with open_input(src) as fin, open(dst,"w") as fout:
+        N,NNZ=read_header(fin)
+        pos=write_mm_header(fout,N,N,None if symmetric else NNZ,symmetric)
+        count=0
+        for row,col,data in iter_triplets(fin,NNZ,index_dtype=np.int64):
+            if symmetric:
+                row,col,data=lower_triangle(row,col,data)
+            write_triplets(fout,row,col,data,sep=" ")
+            count+=len(data)
+        fout.write("\n")
+        if symmetric:
+            fill_count(fout,pos,count)
+        y=read_rhs(fin,N) if rhs else None
+    if rhs:
+        write_mm_rhs(rhs_filename(dst),N,[y])
+
+
+def mm_to_triplet(src, dst, rhs=False):
+    """Convert a coordinate Matrix Market file, and its RHS rhs_filename(src) if
+    `rhs`, to the triplet format by chunks, expanding symmetric storage."""
+    with open_input(src) as fin, open(dst,"w") as fout:
+        header=read_mm_header(fin)
+        if header["rows"]!=header["cols"]:
+            raise ValueError("%s: the matrix is not square" % src)
+        symm=header["symm"]!="general"
+        fout.write(str(header["rows"])+"\n")
+        pos=write_count(fout,None if symm else header["nnz"])
+        count=0
+        for row,col,data in iter_mm_entries(fin,header):
+            if symm:
+                row,col,data=expand_symmetric(row,col,data,header["symm"])
+            write_triplets(fout,row,col,data)
+            count+=len(data)
+        if rhs:
+            write_rhs(fout,read_mm_rhs(rhs_filename(src)))
+        fout.write("\n")
+        if symm:
+            fill_count(fout,pos,count)
+
+
+def convert_matrix(src, dst, fmt="text", symmetric=False, rhs=False,
+    compression=None):
+    """Convert the input file `src` (triplet, binary or Matrix Market, detected
+    from its content, possibly compressed) to `dst` in the `fmt` format.
+
+    Triplet <-> Matrix Market conversions are done by chunks, the others load
+    the matrix in memory. With `compression`, `dst` is compressed once written,
+    since the chunked conversions may have to rewrite its NNZ count.
+    """
+    start_time = time.time()
+    mm=is_mm_file(src)
+    binary=is_binary_file(src)
+    if fmt=="mm" and not (mm or binary):
+        triplet_to_mm(src,dst,symmetric,rhs)
+    elif fmt=="text" and mm:
+        mm_to_triplet(src,dst,rhs)
+    else:
+        if mm:
+            M,y=load_mm_matrix(src,rhs)
+        elif binary:
+            M,y=load_binary_matrix(src,rhs)
+        else:
+            M,y=load_sparse_matrix(src,rhs)
+        if fmt=="mm":
+            save_mm_matrix(dst,M,y,symmetric)
+        elif fmt=="binary":
+            save_binary_matrix(dst,M.shape[0],M.row,M.col,M.data,y)
+        else:
+            save_triplet_matrix(dst,M,y)
+    if compression is not None:
+        compress_file(dst,compression)
+        if fmt=="mm" and rhs:
+            compress_file(rhs_filename(dst),compression)
+    elapsed_time = time.time() - start_time
+    print_banner("Conversion time:"+str(elapsed_time)+"s")
+
+
+#-------------------------------------------------------------------------------
+# Compressed text files, to cut the staging of the inputs on the compute nodes
+
+# File extension and magic number of each codec
+CODECS={"gzip":(".gz",b"\x1f\x8b"),"xz":(".xz",b"\xfd7zXZ\x00"),
+    "zstd":(".zst",b"\x28\xb5\x2f\xfd")}
+# Multi-threaded command line compressors, used when installed
+COMPRESS_TOOLS={"gzip":["pigz","-p","{threads}"],"xz":["xz","-T{threads}"],
+    "zstd":["zstd","-q","-T{threads}"]}
+# Default compression level of each codec
+COMPRESS_LEVELS={"gzip":6,"xz":6,"zstd":3}
+
+
+def compression_params(codec, level=None, threads=0):
+    """Parameters of the compressed outputs, None if `codec` is None.
+
+    threads: 0 uses all the cores (when the codec has a multi-threaded
+    compressor)
+    """
+    if codec is None:
+        return None
+    if codec not in CODECS:
+        raise ValueError("unknown codec: %s" % codec)
+    if level is None:
+        level=COMPRESS_LEVELS[codec]
+    return {"codec":codec,"level":level,
+        "threads":threads or multiprocessing.cpu_count()}
+
+
+def split_codec(filename):
+    """Split the codec extension of `filename`: foo.txt.xz -> (foo.txt, .xz)."""
+    for ext,magic in CODECS.values():
+        if filename.endswith(ext):
+            return filename[:-len(ext)],ext
+    return filename,""
+
+
+def output_filename(filename, compression):
+    """Name of the file written for `filename`: its codec extension is added."""
+    if compression is None:
+        return filename
+    ext=CODECS[compression["codec"]][0]
+    return filename if filename.endswith(ext) else filename+ext
+
+
+def file_codec(filename):
+    """Codec of `filename` from its magic number, None if not compressed."""
+    with open(filename,"rb") as file:
+        start=file.read(8)
+    for codec,(ext,magic) in CODECS.items():
+        if start.startswith(magic):
+            return codec
+    return None
+
+
+def compress_command(compression):
+    """Command line of the multi-threaded compressor, None if not installed or
+    single-threaded."""
+    tool=COMPRESS_TOOLS[compression["codec"]]
+    if compression["threads"]<=1 or shutil.which(tool[0]) is None:
+        return None
+    return [arg.format(threads=compression["threads"]) for arg in tool]+[
+        "-%d" % compression["level"],"-c"]
+
+
+def open_codec(filename, codec, mode, level=None, threads=1):
+    """Open `filename` with the Python module of `codec`, in binary mode."""
+    if codec=="gzip":
+        if "w" in mode:
+            return gzip.open(filename,mode,compresslevel=level)
+        return gzip.open(filename,mode)
+    if codec=="xz":
+        if "w" in mode:
+            return lzma.open(filename,mode,preset=level)
+        return lzma.open(filename,mode)
+    import zstandard
+    if "w" in mode:
+        return zstandard.open(filename,mode,
+            cctx=zstandard.ZstdCompressor(level=level,threads=threads))
+    return io.BufferedReader(zstandard.open(filename,mode),CHUNK_SIZE)
+
+
+@contextmanager
+def pipe(command, stdin=None, stdout=None):
+    """Run `command` for the duration of the block and check its status."""
+    proc=subprocess.Popen(command,stdin=stdin,stdout=stdout)
+    try:
+        yield proc
+    finally:
+        for stream in (proc.stdin,proc.stdout):
+            if stream is not None:
+                stream.close()
+        status=proc.wait()
+    if status:
+        raise IOError("%s exited with status %d" % (command[0],status))
+
+
+@contextmanager
+def open_output(filename, compression=None):
+    """Open `filename` for writing text, compressed on the fly by `compression`
+    (see compression_params): through the multi-threaded command line
+    compressor if installed, else through the Python module of the codec."""
+    if compression is None:
+        with open(filename,"w") as file:
+            yield file
+        return
+    command=compress_command(compression)
+    if command is None and compression["codec"]=="zstd":
+        try:
+            import zstandard
+        except ImportError:
+            if shutil.which("zstd") is None:
+                raise ValueError("zstd compression needs the zstandard module "
+                    "or the zstd command")
+            command=["zstd","-q","-%d" % compression["level"],"-c"]
+    if command is None:
+        with io.TextIOWrapper(open_codec(filename,compression["codec"],"wb",
+            compression["level"],compression["threads"])) as file:
+            yield file
+        return
+    with open(filename,"wb") as raw, pipe(command,subprocess.PIPE,raw) as proc:
+        file=io.TextIOWrapper(proc.stdin)
+        yield file
+        file.flush()
+
+
+@contextmanager
+def open_input(filename):
+    """Open `filename` for reading bytes, decompressing it on the fly if it
+    starts with the magic number of a codec."""
+    codec=file_codec(filename)
+    if codec is None:
+        with open(filename,"rb") as file:
+            yield file
+        return
+    try:
+        file=open_codec(filename,codec,"rb")
+    except ImportError:
+        with pipe([codec,"-dc",filename],stdout=subprocess.PIPE) as proc:
+            yield proc.stdout
+        return
+    with file:
+        yield file
+
+
+def compress_file(filename, compression):
+    """Compress `filename` to output_filename(filename,compression) and remove
+    it."""
+    with open(filename,"rb") as fin, open_output(output_filename(filename,
+        compression),compression) as fout:
+        shutil.copyfileobj(fin,fout.buffer,CHUNK_SIZE)
+    os.remove(filename)
+
+def generate(args, filename, fmt, compression):
+    """Generate `filename` as asked by the command line `args`."""
+    if args.kind!="random":
+        params=structured_params(args.kind,args.N,args.grid,args.bandwidth,
+            args.fill,args.block_size,args.coupling,args.spd,args.diagonal,
+            args.solution)
+        save_structured_matrix(filename,params,args.RHS,args.seed,
+            args.block_rows,args.workers,fmt,args.symmetric,compression)
+    elif args.stream or args.workers>1 :
+        stream_sparse_matrix(filename,args.N,args.density,args.RHS,args.seed,
+            args.block_rows,args.workers,fmt,args.diagonal,
+            args.solution,compression)
+    else:
+        save_sparse_matrix(filename,args.N,args.density,args.RHS,args.seed,
+            fmt,args.diagonal,args.solution,compression)
+
+
+def cache_params(args, fmt, compression):
+    """Parameters identifying the files generated by `args` in the matrix cache
+    (the number of workers and of compression threads does not change the
+    content)."""
+    params={"version":GENERATOR_VERSION,"n":args.N,"seed":args.seed,
+        "rhs":args.RHS,"kind":args.kind,"diagonal":args.diagonal,
+        "solution":args.solution,"format":fmt,"symmetric":args.symmetric}
+    if compression is not None:
+        params["compression"]=[compression["codec"],compression["level"]]
+    if args.kind=="random":
+        # the in-memory and the streaming generators draw different matrices,
+        # the latter depending on the row blocks
+        stream=args.stream or args.workers>1
+        params.update(density=args.density,stream=stream,
+            block_rows=args.block_rows if stream else None)
+    else:
+        params.update(grid=args.grid,bandwidth=args.bandwidth,fill=args.fill,
+            block_size=args.block_size,coupling=args.coupling,spd=args.spd)
+    return params
 
-    print(y)
-    return M
 
 parser = ArgumentParser()
 
@@ -133,11 +1431,105 @@ parser.add_argument("-d","--density",
                     help="Density of the sparse matrix [default value 5%]",type=float)
 
 parser.add_argument("--load", dest="load",action="store_true",
-    help="Load and print dense structure of saved file")
+    help="Load the saved file")
+
+parser.add_argument("--dense", dest="dense",action="store_true",default=False,
+    help="Print the dense structure of the file loaded with --load")
+
+parser.add_argument("--mmap-dir", dest="mmap_dir", default=None,metavar="DIR",
+    help="Store the arrays loaded with --load as .npy memmaps in DIR")
 
 parser.add_argument("--RHS", dest="RHS",action="store_true",default=False,
     help="Generate and save Right Hand Side of Ax=b[default value False]")
 
+parser.add_argument("--seed", dest="seed", default=None,metavar="s",
+    help="Seed of the random generator [default: random]",type=int)
+
+parser.add_argument("--stream", dest="stream",action="store_true",default=False,
+    help="Generate and write the matrix by row blocks, memory does not depend on NNZ")
+
+parser.add_argument("--workers", dest="workers", default=1,metavar="w",
+    help="Number of processes generating the row blocks, 0 for all the cores,"
+    " implies --stream [default value 1]",type=int)
+
+parser.add_argument("--kind", dest="kind", default="random",
+    choices=("random",)+STRUCTURED_KINDS,
+    help="Kind of matrix: uniform random pattern, 2D (5 points) or 3D (7/27 points) "
+    "Laplacian, banded or block diagonal [default value random]")
+
+parser.add_argument("--grid", dest="grid", nargs="+", default=None,type=int,
+    metavar="nx", help="Grid of the Laplacians, nx ny [nz] [default: square or "
+    "cube of about N points]")
+
+parser.add_argument("--bandwidth", dest="bandwidth", default=10,metavar="b",
+    help="Half bandwidth of the banded matrix [default value 10]",type=int)
+
+parser.add_argument("--band-fill", dest="fill", default=1.0,metavar="f",
+    help="Fraction of the band positions that are nonzero [default value 1]",
+    type=float)
+
+parser.add_argument("--block-size", dest="block_size", default=100,metavar="s",
+    help="Size of the diagonal blocks of blockdiag [default value 100]",type=int)
+
+parser.add_argument("--coupling", dest="coupling", default=0.01,metavar="c",
+    help="Fraction of nonzeros coupling neighbour diagonal blocks "
+    "[default value 0.01]",type=float)
+
+parser.add_argument("--spd", dest="spd",action="store_true",default=False,
+    help="Symmetric positive definite values for banded and blockdiag")
+
+parser.add_argument("--diagonal", dest="diagonal", default="none",
+    choices=("none","full","dominant"),
+    help="Add every diagonal entry (full), and make the rows strictly diagonally "
+    "dominant (dominant), so that the system is nonsingular [default value none]")
+
+parser.add_argument("--solution", dest="solution",action="store_true",
+    default=False,help="Build the RHS as A*x_true and save x_true in "
+    "FILE.xtrue.npy (implies --RHS)")
+
+parser.add_argument("--binary", dest="binary",action="store_true",default=False,
+    help="Save the binary container read by mpiread and dsimpletest -t 5 (with "
+    "--RHS) instead of the text format")
+
+parser.add_argument("--mm", dest="mm",action="store_true",default=False,
+    help="Save a Matrix Market file (dsimpletest -t 3), the RHS going to "
+    "FILE_rhs1.mtx")
+
+parser.add_argument("--symmetric", dest="symmetric",action="store_true",
+    default=False,help="With --mm, store only the lower triangle of a "
+    "symmetric matrix")
+
+parser.add_argument("--convert", dest="convert", default=None,metavar="SRC",
+    help="Convert SRC (triplet, binary or Matrix Market) to FILE in the format "
+    "given by --binary/--mm [default: triplet] instead of generating a matrix")
+
+parser.add_argument("--compress", dest="compress", default=None,
+    choices=sorted(CODECS),help="Compress the text outputs on the fly, adding "
+    "the codec extension to FILE (the loader decompresses on the fly)")
+
+parser.add_argument("--compress-level", dest="compress_level", default=None,
+    type=int,metavar="L",help="Compression level [default: 6 for gzip and xz, "
+    "3 for zstd]")
+
+parser.add_argument("--compress-threads", dest="compress_threads", default=0,
+    type=int,metavar="T",help="Compression threads, used when pigz/xz/zstd is "
+    "installed; 0 for all the cores [default value 0]")
+
+parser.add_argument("--cache", dest="cache", default=None,metavar="DIR",
+    help="Take FILE from the matrix cache DIR (see matrix_cache.py), "
+    "generating it there on a miss; needs --seed")
+
+parser.add_argument("--cache-size", dest="cache_size", default=None,type=float,
+    metavar="GB",help="Disk budget of --cache, the least recently used "
+    "matrices being evicted beyond it [default: unlimited]")
+
+parser.add_argument("--cache-verify", dest="cache_verify",action="store_true",
+    default=False,help="Check the SHA-256 of the cached files on a hit")
+
+parser.add_argument("--block-rows", dest="block_rows", default=None,metavar="b",
+    help="Rows per block in --stream mode [default: about "+str(BLOCK_NNZ)+
+    " nonzeros per block]",type=int)
+
 
 #-------------------------------------------------------------------------------
 if __name__ == '__main__':
@@ -146,11 +1538,40 @@ if __name__ == '__main__':
     n=m=args.N
     # matrixA=sparse.rand(n,m,density=args.density)
     # print(matrixA)
-    if args.RHS :
-        save_sparse_matrix(args.filename,n,args.density,args.RHS)
+    if args.workers==0:
+        args.workers=multiprocessing.cpu_count()
+    if args.binary and args.mm:
+        parser.error("--binary and --mm are exclusive")
+    if args.symmetric and not args.mm:
+        parser.error("--symmetric requires --mm")
+    if args.symmetric and not args.convert and args.kind=="random":
+        parser.error("--symmetric needs a symmetric --kind")
+    if args.compress and args.binary:
+        parser.error("the binary container cannot be compressed")
+    fmt="binary" if args.binary else "mm" if args.mm else "text"
+    compression=compression_params(args.compress,args.compress_level,
+        args.compress_threads)
+    if args.cache and (args.seed is None or args.convert):
+        parser.error("--cache needs --seed and cannot be used with --convert")
+    if args.convert:
+        convert_matrix(args.convert,args.filename,fmt,args.symmetric,args.RHS,
+            compression)
+    elif args.cache:
+        budget=None if args.cache_size is None else int(args.cache_size*
+            matrix_cache.GB)
+        matrix_cache.fetch(args.cache,cache_params(args,fmt,compression),
+            lambda filename: generate(args,filename,fmt,compression),
+            split_codec(args.filename)[0],budget,args.cache_verify)
     else:
-        save_sparse_matrix(args.filename,n,args.density)
-    loadfile=args.filename #'input_simpletest_real'#"aster_matrix_input"
+        generate(args,args.filename,fmt,compression)
+    #'input_simpletest_real'#"aster_matrix_input"
+    loadfile=output_filename(args.filename,compression)
+    args.RHS=args.RHS or args.solution
 
     if args.load :
-        load_sparse_matrix(loadfile,args.RHS)#.tolil()
\ No newline at end of file
+        if is_binary_file(loadfile):
+            load_binary_matrix(loadfile,args.RHS,args.dense)
+        elif is_mm_file(loadfile):
+            load_mm_matrix(loadfile,args.RHS,dense=args.dense)
+        else:
+            load_sparse_matrix(loadfile,args.RHS,args.mmap_dir,args.dense)
\ No newline at end of file